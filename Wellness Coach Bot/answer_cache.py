@@ -0,0 +1,225 @@
+import hashlib
+import random
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Any, FrozenSet, Iterable, List, Optional, Tuple
+
+from intent_router import PhraseMatcher, tokenize, get_default_router
+
+DEFAULT_TTL_SECONDS = 24 * 3600
+DEFAULT_MAX_ENTRIES = 2048
+
+# Profile fields that change what a good generic answer looks like
+PROFILE_KEY_FIELDS = ("age", "activity_level", "dietary_preferences", "primary_goal", "health_notes")
+
+# Phrases in a reply that mean it was written around the user's own data, so it must not be reused
+PERSONAL_REPLY_PATTERNS = [
+    "your (streak|streaks|tracked|logs|logged|entries|data|trend|trends|numbers)",
+    "you've (been tracking|tracked|logged|recorded)", "you (tracked|logged|recorded)",
+    "over the (last|past) # days", "this week", "last week", "yesterday"
+]
+
+# Words that flip what a question asks ("... with" vs "... without"); a near-duplicate only
+# shares an answer when both questions use the same ones. "n't" contractions count as "not".
+NEGATORS = frozenset({"not", "no", "never", "without", "avoid", "cannot", "nor"})
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def profile_key(profile: Dict[str, Any]) -> str:
+    """Stable fingerprint of the answer-relevant profile fields (ages bucketed by decade)"""
+    parts = []
+    for field in PROFILE_KEY_FIELDS:
+        value = str(profile.get(field, "")).strip().lower()
+        if field == "age" and value.isdigit():
+            value = f"{int(value) // 10 * 10}s"
+        parts.append(f"{field}={' '.join(tokenize(value))}")
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def is_negator(token: str) -> bool:
+    return token in NEGATORS or token.endswith("n't")
+
+
+def negations(tokens: Iterable[str]) -> FrozenSet[str]:
+    """The negators among tokens ("n't" contractions and "cannot" count as "not")"""
+    return frozenset("not" if token.endswith("n't") or token == "cannot" else token
+                     for token in tokens if is_negator(token))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """MinHash signatures over token sets, using (a*x + b) mod p permutations of crc32"""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.params = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+                       for _ in range(num_perm)]
+
+    def signature(self, tokens: Iterable[str]) -> Tuple[int, ...]:
+        hashes = [zlib.crc32(t.encode("utf-8")) for t in tokens]
+        if not hashes:
+            return tuple(0 for _ in self.params)
+        return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self.params)
+
+
+class _Entry:
+    __slots__ = ("profile", "tokens", "negations", "bands", "answer", "created")
+
+    def __init__(self, profile: str, tokens: FrozenSet[str], bands: List[tuple], answer: str):
+        self.profile = profile
+        self.tokens = tokens
+        self.negations = negations(tokens)
+        self.bands = bands
+        self.answer = answer
+        self.created = time.time()
+
+
+class AnswerCache:
+    """Near-duplicate question -> answer cache with TTL and LRU bounds.
+
+    Questions are reduced to content-token sets. Exact sets are looked up
+    directly; otherwise MinHash + LSH banding finds candidates, which are
+    confirmed with the exact Jaccard similarity against `threshold` and must use
+    the same negators ("not", "without", ...) as the question. Entries are
+    partitioned by the profile fingerprint, so users with different ages, diets
+    or goals never share answers.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 threshold: float = 0.8, num_perm: int = 64, bands: int = 16, min_tokens: int = 2,
+                 stopwords: Iterable[str] = ()):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.min_tokens = min_tokens
+        self.stopwords = frozenset(stopwords)
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._exact: Dict[tuple, int] = {}
+        self._buckets: Dict[tuple, set] = {}
+        self._ids = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def tokens(self, question: str) -> FrozenSet[str]:
+        """Content tokens; negators are kept even if they are configured as stopwords"""
+        return frozenset(t for t in tokenize(question) if t not in self.stopwords or is_negator(t))
+
+    def _band_keys(self, profile: str, tokens: FrozenSet[str]) -> List[tuple]:
+        sig = self.hasher.signature(sorted(tokens))
+        return [(profile, i, sig[i * self.rows:(i + 1) * self.rows]) for i in range(self.bands)]
+
+    def get(self, question: str, profile: Dict[str, Any]) -> Optional[str]:
+        """Cached answer for a question similar enough to this one, or None"""
+        tokens = self.tokens(question)
+        if len(tokens) < self.min_tokens:
+            return None
+        negated = negations(tokens)
+        pkey = profile_key(profile)
+        now = time.time()
+        with self._lock:
+            entry_id = self._exact.get((pkey, tokens))
+            if entry_id is None:
+                candidates = set()
+                for band in self._band_keys(pkey, tokens):
+                    candidates |= self._buckets.get(band, set())
+                best = 0.0
+                for candidate in candidates:
+                    if self._entries[candidate].negations != negated:
+                        continue
+                    score = jaccard(tokens, self._entries[candidate].tokens)
+                    if score >= self.threshold and score > best:
+                        entry_id, best = candidate, score
+
+            entry = self._entries.get(entry_id) if entry_id is not None else None
+            if entry is not None and now - entry.created > self.ttl:
+                self._remove(entry_id)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            return entry.answer
+
+    def set(self, question: str, profile: Dict[str, Any], answer: str):
+        tokens = self.tokens(question)
+        if len(tokens) < self.min_tokens:
+            return
+        pkey = profile_key(profile)
+        with self._lock:
+            old = self._exact.get((pkey, tokens))
+            if old is not None:
+                self._remove(old)
+            self._ids += 1
+            entry = _Entry(pkey, tokens, self._band_keys(pkey, tokens), answer)
+            self._entries[self._ids] = entry
+            self._exact[(pkey, tokens)] = self._ids
+            for band in entry.bands:
+                self._buckets.setdefault(band, set()).add(self._ids)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        self._exact.pop((entry.profile, entry.tokens), None)
+        for band in entry.bands:
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[band]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries)
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._exact.clear()
+            self._buckets.clear()
+
+
+def personal_reply_matcher(goals: Iterable[str], metrics: Iterable[str]) -> PhraseMatcher:
+    """Matcher for replies that quote a user's goals or talk about their tracked metrics"""
+    matcher = PhraseMatcher()
+    for pattern in PERSONAL_REPLY_PATTERNS:
+        matcher.add(pattern, "personal")
+    for goal in goals:
+        matcher.add(goal.replace("(", " ").replace(")", " "), "goal")
+    for metric in metrics:
+        matcher.add(f"your {metric}", "metric")
+    return matcher
+
+
+_SHARED_ANSWER_CACHE: Optional[AnswerCache] = None
+_SHARED_ANSWER_CACHE_LOCK = threading.Lock()
+
+
+def get_shared_answer_cache() -> AnswerCache:
+    """One answer cache per process, so every user benefits from generic answers"""
+    global _SHARED_ANSWER_CACHE
+    with _SHARED_ANSWER_CACHE_LOCK:
+        if _SHARED_ANSWER_CACHE is None:
+            _SHARED_ANSWER_CACHE = AnswerCache(stopwords=get_default_router().stopwords)
+        return _SHARED_ANSWER_CACHE
@@ -1,47 +1,188 @@
-import google.generativeai as genai
+import asyncio
 import json
 import time
-import requests 
-from typing import Dict, Any, Optional 
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from typing import Dict, Any, List, Optional 
 import os
-from datetime import datetime, timedelta
+import sys
+from datetime import date, datetime, timedelta
 from dotenv import load_dotenv
+from search_cache import SearchCacheBackend, get_shared_cache, normalize_query
+from search_client import SerperClient, SERPER_URL, get_shared_client
+from model_factory import ModelFactory, get_model_factory
+from metrics_store import MetricsStore
+from goal_store import GoalStore, infer_direction, infer_metric_link
+from context_builder import ContextBuilder, compact_json, truncate
+from chat_session import RollingChatSession, estimate_tokens
+from validator import TieredValidator, parse_verdict
+from validation_batcher import DEFAULT_WINDOW_MS, ValidationBatcher, get_validation_batcher
+from session_store import SessionJournal, atomic_write_json
+from intent_router import Intent, get_default_router, tokenize
+from trust_registry import get_default_registry
+from instrumentation import Instrumentation, TurnTrace, get_default_instrumentation
+from answer_cache import PROFILE_KEY_FIELDS, AnswerCache, get_shared_answer_cache, personal_reply_matcher
+from rate_limiter import INTERACTIVE, PREFETCH, SingleFlight, get_rate_limiter
+from prefetch import SearchPrefetcher, get_shared_prefetcher
+from recall_index import RecallIndex
+from search_fanout import expand_query, merge_results
+from session_records import Exchange, deep_sizeof
+from resilience import CircuitOpen, DeadlineExceeded, call_with_deadline, get_breaker, get_latency_tracker, iter_with_deadline
 load_dotenv()
 
+# Shared worker pool for the blocking SDK/HTTP calls made by the async pipeline.
+# A dedicated executor (instead of the loop default) means asyncio.run() in chat()
+# never waits on speculative work that was thrown away.
+_BLOCKING_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv("WELLNESS_WORKERS", "32")),
+                                        thread_name_prefix="wellness")
+
+# chat() called from inside a running event loop (Jupyter, async hosts) runs the turn on its own loop here
+_SYNC_CHAT_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv("WELLNESS_SYNC_CHAT_WORKERS", "8")),
+                                         thread_name_prefix="sync-chat")
+
+# Concurrent cache misses for the same query (from any session) share one Serper request
+_SEARCH_FLIGHTS = SingleFlight()
+
+# Sub-queries of a fan-out search; kept apart from the pools their own searches wait on
+_FANOUT_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv("WELLNESS_FANOUT_WORKERS", "32")),
+                                      thread_name_prefix="fanout")
+
+# Output tokens budgeted per Gemini call before the reply length is known
+GENERATION_TOKEN_ALLOWANCE = 512
+
+# Latency deadlines per dependency, in seconds; a call past its deadline counts as a failure
+SEARCH_DEADLINE = float(os.getenv("WELLNESS_SEARCH_DEADLINE", "5"))
+VALIDATOR_DEADLINE = float(os.getenv("WELLNESS_VALIDATOR_DEADLINE", "4"))
+GENERATION_DEADLINE = float(os.getenv("WELLNESS_GENERATION_DEADLINE", "45"))
+
+# An interactive search still running after the recent p95 latency gets one duplicate request
+HEDGE_DEFAULT_DELAY = 1.0
+HEDGE_MIN_DELAY = 0.2
+
+# Once the original query of a fan-out search is answered, the other sub-queries get this much longer
+FANOUT_GRACE_SECONDS = float(os.getenv("WELLNESS_FANOUT_GRACE", "0.25"))
+
+# Expired search results are served at once, and refreshed in the background, for this long past their TTL
+STALE_WHILE_REVALIDATE_SECONDS = 24 * 3600
+
+# Active goals due within this many days are surfaced as reminders (at most this many per turn)
+GOAL_REMINDER_DAYS = 7
+GOAL_REMINDER_LIMIT = 5
+
+# Earlier exchanges recalled into each prompt, and the most JSON bytes they may take
+RECALL_TOP_K = 3
+RECALL_MAX_BYTES = 1200
+# Autosaved sessions in one directory share this recall index file, each under its own name
+RECALL_DB_NAME = "wellness_recall.db"
+
+# Search results in the prompt, their snippet length, and the length they are cut to when over budget
+PROMPT_SEARCH_RESULTS = 3
+SNIPPET_CHARS = 300
+REDUCED_SNIPPET_CHARS = 100
+
+# Active goals this far past their target date are the first dropped when the prompt is over budget
+STALE_GOAL_DAYS = 30
+
 class PersonalWellnessCoach:
-    def __init__(self, api_key: str, serper_api_key: str = None):
+    def __init__(self, api_key: str, serper_api_key: str = None, search_cache: SearchCacheBackend = None,
+                 search_client: SerperClient = None, model_factory: ModelFactory = None,
+                 instrumentation: Instrumentation = None, answer_cache: AnswerCache = None,
+                 prefetcher: SearchPrefetcher = None, validation_batcher: ValidationBatcher = None):
         """Initialize the Personal Wellness Coach System"""
-        genai.configure(api_key=api_key)
-        
-        self.wellness_model = genai.GenerativeModel("gemini-2.0-flash")
-        self.validator_model = genai.GenerativeModel("gemini-2.0-flash")
+        # Models come from a process-wide factory; nothing here touches the network
+        self.model_factory = model_factory or get_model_factory(api_key)
         
         # Serper API configuration
         self.serper_api_key = serper_api_key or os.getenv("SERPER_API_KEY")
-        self.serper_url = "https://google.serper.dev/search"
+        self.serper_url = SERPER_URL
+        # Pooled client shared by every session using the same key
+        self.search_client = search_client
+        if self.search_client is None and self.serper_api_key:
+            self.search_client = get_shared_client(self.serper_api_key, self.serper_url)
         
-        self.wellness_chat = None
-        self.validator_chat = None
+        # Chat agents are created on first use
+        self._wellness_chat = None
+        self._validator_chat = None
+        # One compiled pass over each input decides commands, search and validator hints
+        self.router = get_default_router()
+        self.trust_registry = get_default_registry()
+        # Local rules and cached verdicts answer most turns; the validator agent only sees ambiguous input
+        self.validator = TieredValidator(self._llm_validate)
+        # Validator calls are stateless and micro-batched across sessions (WELLNESS_VALIDATION_BATCH_MS=0
+        # keeps a per-session validator chat instead)
+        self._validation_batcher = validation_batcher
+        self.batch_validation = validation_batcher is not None or DEFAULT_WINDOW_MS > 0
+        # Latency of the last answered turn: time-to-first-token and total, in seconds
+        self.last_turn_timing = {}
+        # Error type of the last turn when it ended in the "technical hiccup" fallback reply, else None
+        self.last_turn_error: Optional[str] = None
+        # Outbound Gemini calls share a process-wide budget; batch/prefetch sessions lower their priority
+        self.priority = INTERACTIVE
+        self.gemini_limiter = get_rate_limiter("gemini")
+        # Process-wide breakers: once a dependency keeps failing, turns skip it instead of waiting on it
+        self.search_breaker = get_breaker("serper")
+        self.validator_breaker = get_breaker("validator")
+        # Per-stage latency/token traces of every turn go to the process-wide sinks
+        self.instrumentation = instrumentation or get_default_instrumentation()
+        # Opt-in (WELLNESS_ANSWER_CACHE=1): reuse answers to near-identical generic questions
+        self.answer_cache = answer_cache
+        if self.answer_cache is None and os.getenv("WELLNESS_ANSWER_CACHE") == "1":
+            self.answer_cache = get_shared_answer_cache()
+        # Opt-in (WELLNESS_PREFETCH=1): search likely topics in the background when interests change
+        self.prefetcher = prefetcher
+        if self.prefetcher is None and os.getenv("WELLNESS_PREFETCH") == "1":
+            self.prefetcher = get_shared_prefetcher()
+        # Opt-in (WELLNESS_SEARCH_FANOUT=1): turns search focused variants of the query too and merge them
+        self.search_fanout = os.getenv("WELLNESS_SEARCH_FANOUT") == "1"
+        # Interests changed without a prefetch yet (e.g. restored sessions); the server prefetches these when idle
+        self.prefetch_pending = False
         
         self.user_profile = {}
+        self._profile_version = 0
+        # Serialized prompt sections are cached between turns; only changed ones are rebuilt
+        self.context_builder = ContextBuilder()
+        # Every exchange is also indexed here, so ones that left the 20-exchange window can be recalled
+        self.recall = RecallIndex(stopwords=self.router.stopwords)
+        self._recent_context: Optional[str] = None
         self.conversation_memory = []
-        self.wellness_goals = []
-        self.daily_tracking = {}
-        self.search_cache = {}  # Cache recent searches
-        
-        self._setup_conversational_agents()
+        self.goals = GoalStore()
+        self.metrics = MetricsStore()
+        # Search results are cached outside the session so restarts and other workers can reuse them;
+        # without a search client nothing is ever searched, so no cache file is opened
+        self.search_cache: Optional[SearchCacheBackend] = search_cache
+        if self.search_cache is None and self.search_client is not None:
+            self.search_cache = get_shared_cache(os.getenv("WELLNESS_SEARCH_CACHE", "wellness_search_cache.db"))
+        # Set by enable_autosave(); every change is then appended to the session journal
+        self.journal: Optional[SessionJournal] = None
     
+    @property
+    def wellness_model(self):
+        return self.model_factory.get(self._get_wellness_system_prompt())
+
+    @property
+    def validator_model(self):
+        return self.model_factory.get(self._get_validator_system_prompt())
+
+    @property
+    def wellness_chat(self) -> RollingChatSession:
+        if self._wellness_chat is None:
+            # Rolling sessions keep a bounded window of turns so history stops growing every turn
+            self._wellness_chat = RollingChatSession(self.wellness_model, max_turns=6, token_budget=4000)
+        return self._wellness_chat
+
+    @property
+    def validator_chat(self) -> RollingChatSession:
+        if self._validator_chat is None:
+            self._validator_chat = RollingChatSession(self.validator_model, max_turns=4, token_budget=1500)
+        return self._validator_chat
+
     def _setup_conversational_agents(self):
-        """Set up both agents as conversational chatbots"""
-        
-        wellness_system_prompt = self._get_wellness_system_prompt()
-        validator_system_prompt = self._get_validator_system_prompt()
-        
-        self.wellness_chat = self.wellness_model.start_chat(history=[])
-        self.validator_chat = self.validator_model.start_chat(history=[])
-        
-        self.wellness_chat.send_message(wellness_system_prompt)
-        self.validator_chat.send_message(validator_system_prompt)
+        """Reset both agents; they are rebuilt lazily on next use.
+
+        The system prompts are model-level system instructions, so a fresh
+        chat needs no setup messages.
+        """
+        self._wellness_chat = None
+        self._validator_chat = None
 
     def _get_wellness_system_prompt(self) -> str:
         """System prompt for the wellness coach"""
@@ -116,52 +257,116 @@ Response format:
 
 Be lenient with wellness-related questions and only mark as invalid if clearly inappropriate or potentially harmful."""
 
-    def search_health_info(self, query: str, num_results: int = 5) -> Dict[str, Any]:
+    def search_health_info(self, query: str, num_results: int = 5, fanout: bool = False) -> Dict[str, Any]:
         """Search for health and wellness information using Serper API"""
-        if not self.serper_api_key:
-            return {"error": "Serper API key not configured"}
+        if fanout:
+            return self._fanout_search(query, num_results)[0]
+        return self._search(query, num_results)[0]
+
+    def _fanout_search(self, query: str, num_results: int = 5, priority: int = None) -> tuple[Dict[str, Any], str]:
+        """Search the query and its focused variants concurrently; merge whatever is answered in time.
+
+        The original query runs on the calling thread exactly like a single
+        search. The variants run alongside it and get FANOUT_GRACE_SECONDS more
+        once it returns (the whole deadline if it failed), so fanning out adds
+        no wall-clock time when the sub-queries are about as fast. Variants that
+        miss the cut keep running and land in the cache for the next asker.
+        """
+        if self.search_client is None:
+            return {"error": "Serper API key not configured"}, "error"
+        start = time.monotonic()
+        variants = expand_query(query, self.trust_registry)
+        futures = {name: _FANOUT_EXECUTOR.submit(self._search, text, num_results, priority, False)
+                   for name, text in variants.items() if name != "original"}
+        legs = {"original": self._search(query, num_results, priority)}
+        remaining = max(0.0, start + SEARCH_DEADLINE - time.monotonic())
+        wait(futures.values(), timeout=remaining if "error" in legs["original"][0] else
+             min(FANOUT_GRACE_SECONDS, remaining))
+        legs.update((name, future.result()) for name, future in futures.items() if future.done())
+
+        answered = {name: leg for name, leg in legs.items() if "error" not in leg[0]}
+        if not answered:
+            return legs["original"]
+        merged = {
+            "query": query,
+            "results": merge_results([leg[0].get("results", []) for leg in answered.values()], num_results),
+            "sub_queries": list(answered),
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        sources = {leg[1] for leg in answered.values()}
+        source = next((label for label in ("network", "coalesced", "stale") if label in sources), "cache")
+        return merged, source
+
+    def _search(self, query: str, num_results: int = 5, priority: int = None,
+                enhance: bool = True) -> tuple[Dict[str, Any], str]:
+        """search_health_info() plus where the answer came from: cache, stale, coalesced, network or error"""
+        if self.search_client is None:
+            return {"error": "Serper API key not configured"}, "error"
         
-        # Check cache first
-        cache_key = f"{query}_{num_results}"
-        if cache_key in self.search_cache:
-            cache_time = self.search_cache[cache_key].get("timestamp", 0)
-            # Use cached results if less than 1 hour old
-            if time.time() - cache_time < 3600:
-                return self.search_cache[cache_key]["results"]
+        # Check cache first; the prefetcher's own lookups don't count towards what users ask for
+        cached = self.search_cache.get(query, num_results, track=priority != PREFETCH)
+        if cached is not None:
+            return cached, "cache"
+
+        # Recently expired: answer with it now and refresh it in the background
+        stale = self.search_cache.get_stale(query, num_results)
+        if stale is not None and stale[1] < STALE_WHILE_REVALIDATE_SECONDS:
+            _BLOCKING_EXECUTOR.submit(self._revalidate_search, query, num_results, enhance)
+            self.search_cache.count_stale_hit()
+            return stale[0], "stale"
+
+        if not self.search_breaker.allow():
+            if stale is not None:
+                self.search_cache.count_stale_hit()
+                return stale[0], "stale"
+            return {"error": "Search is temporarily unavailable"}, "error"
         
         try:
-            headers = {
-                'X-API-KEY': self.serper_api_key,
-                'Content-Type': 'application/json'
-            }
-            
-            # Enhance query for health/wellness context
-            enhanced_query = f"{query} health wellness research study"
-            
-            payload = {
-                'q': enhanced_query,
-                'num': num_results,
-                'gl': 'us',  # Geolocation
-                'hl': 'en'   # Language
-            }
-            
-            response = requests.post(self.serper_url, headers=headers, json=payload, timeout=10)
-            response.raise_for_status()
-            
-            search_results = response.json()
-            
-            processed_results = self._process_search_results(search_results, query)
-            
-            self.search_cache[cache_key] = {
-                "results": processed_results,
-                "timestamp": time.time()
-            }
-            
-            return processed_results
+            processed_results, shared = _SEARCH_FLIGHTS.do(normalize_query(query, num_results),
+                                                           lambda: self._fetch_search(query, num_results, priority, enhance))
+            return processed_results, "coalesced" if shared else "network"
             
         except Exception as e:
             print(f"Search error: {e}")
-            return {"error": f"Search failed: {str(e)}"}
+            if stale is not None:
+                self.search_cache.count_stale_hit()
+                return stale[0], "stale"
+            return {"error": f"Search failed: {str(e)}"}, "error"
+
+    def _revalidate_search(self, query: str, num_results: int, enhance: bool = True):
+        if not self.search_breaker.allow():
+            return
+        try:
+            _SEARCH_FLIGHTS.do(normalize_query(query, num_results),
+                               lambda: self._fetch_search(query, num_results, PREFETCH, enhance))
+        except Exception as e:
+            print(f"Search refresh error: {e}")
+
+    def _fetch_search(self, query: str, num_results: int, priority: int = None, enhance: bool = True) -> Dict[str, Any]:
+        # Enhance query for health/wellness context (fan-out variants are already focused and go out as-is)
+        enhanced_query = f"{query} health wellness research study" if enhance else query
+        priority = self.priority if priority is None else priority
+        latency = get_latency_tracker("serper")
+
+        # Only interactive turns are worth a duplicate request; batch and prefetch work just waits
+        hedge_after = None
+        if priority == INTERACTIVE:
+            hedge_after = max(HEDGE_MIN_DELAY, latency.percentile(0.95, HEDGE_DEFAULT_DELAY))
+        start = time.monotonic()
+        try:
+            search_results = self.search_client.search(enhanced_query, num_results, priority=priority,
+                                                       hedge_after=hedge_after, deadline=SEARCH_DEADLINE)
+        except Exception:
+            self.search_breaker.record_failure()
+            raise
+        latency.observe(time.monotonic() - start)
+        self.search_breaker.record_success()
+        
+        processed_results = self._process_search_results(search_results, query)
+        
+        self.search_cache.set(query, processed_results, num_results)
+        
+        return processed_results
     
     def _process_search_results(self, raw_results: Dict, original_query: str) -> Dict[str, Any]:
         """Process and filter search results for health relevance"""
@@ -171,107 +376,101 @@ Be lenient with wellness-related questions and only mark as invalid if clearly i
             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
         
-        organic_results = raw_results.get("organic", [])
-        
-        for result in organic_results:
-            trusted_domains = [
-                'nih.gov', 'cdc.gov', 'who.int', 'mayo clinic', 'harvard health',
-                'webmd.com', 'healthline.com', 'medicalnewstoday.com', 
-                'pubmed.ncbi.nlm.nih.gov', 'nhs.uk', 'cleveland clinic'
-            ]
-            
-            source_url = result.get("link", "").lower()
-            title = result.get("title", "")
-            snippet = result.get("snippet", "")
-            
-            # Prioritize trusted sources
-            trust_score = 1
-            for domain in trusted_domains:
-                if domain in source_url or domain in title.lower():
-                    trust_score = 5
-                    break
-            
-            processed_result = {
-                "title": title,
-                "url": result.get("link"),
-                "snippet": snippet,
-                "trust_score": trust_score,
-                "source": self._extract_domain(result.get("link", ""))
-            }
-            
-            processed["results"].append(processed_result)
-        
-        # Sort by trust score
-        processed["results"].sort(key=lambda x: x["trust_score"], reverse=True)
+        # Scoring and dedup across organic / knowledge graph / "people also ask" via the shared registry
+        processed["results"] = self.trust_registry.process(raw_results)
         
         return processed
     
-    def _extract_domain(self, url: str) -> str:
-        """Extract domain name from URL"""
-        try:
-            from urllib.parse import urlparse
-            domain = urlparse(url).netloc
-            return domain.replace('www.', '')
-        except:
-            return "Unknown"
-    
     def _should_search(self, user_input: str) -> bool:
         """Determine if the user input requires a search"""
-        search_triggers = [
-            'latest', 'recent', 'current', 'new study', 'research shows',
-            'what does science say', 'studies on', 'research on',
-            'latest guidelines', 'current recommendations', 'recent findings',
-            'what are the benefits of', 'nutritional information',
-            'calories in', 'is it healthy', 'side effects',
-            'how to', 'best way to', 'most effective',
-            'compare', 'vs', 'difference between',
-            'local', 'near me', 'in my area'
-        ]
-        
-        user_lower = user_input.lower()
-        return any(trigger in user_lower for trigger in search_triggers)
+        return self.router.route(user_input).needs_search
 
-    def _is_valid_input(self, user_input: str) -> tuple[bool, str]:
-        """Quick validation check using the validator agent"""
+    def _is_valid_input(self, user_input: str, intent: Intent = None) -> tuple[bool, str]:
+        """Quick validation check: local rules, cached verdicts, then the validator agent"""
         try:
-            validation_prompt = f"""Validate this user input: "{user_input}"
+            return self.validator.validate(user_input, intent)
+        except CircuitOpen:
+            return True, ""  # the validator keeps failing; answer without it until it recovers
+        except Exception as e:
+            print(f"Validation error: {e}")
+            return True, ""
+
+    @property
+    def validation_batcher(self) -> ValidationBatcher:
+        if self._validation_batcher is None:
+            self._validation_batcher = get_validation_batcher(self.validator_model, self.gemini_limiter)
+        return self._validation_batcher
+
+    def _validation_context(self) -> str:
+        """Compact context for a stateless validator call: the last two exchanges, replies shortened"""
+        return compact_json([{"user": e.user, "agent": truncate(e.agent, 200)} for e in self.conversation_memory[-2:]])
+
+    def _llm_validate(self, user_input: str) -> tuple[bool, str]:
+        """Ask the validator agent within its deadline; errors propagate so failed calls are never cached"""
+        return self.validator_breaker.call(self._call_validator, user_input)
+
+    def _call_validator(self, user_input: str) -> tuple[bool, str]:
+        if self.batch_validation:
+            future = self.validation_batcher.submit(user_input, self._validation_context(), self.priority)
+            try:
+                return future.result(timeout=VALIDATOR_DEADLINE)
+            except FutureTimeout:
+                raise DeadlineExceeded(f"validator gave no verdict within {VALIDATOR_DEADLINE:g}s")
+
+        validation_prompt = f"""Validate this user input: "{user_input}"
             
 Previous conversation context: {self._get_recent_context()}
 
 Is this appropriate for a wellness coach?"""
 
-            response = self.validator_chat.send_message(validation_prompt)
-            result = response.text.strip()
-            
-            if result.startswith("VALID"):
-                return True, ""
-            elif result.startswith("INVALID"):
-                redirect_msg = result.replace("INVALID:", "").strip()
-                if not redirect_msg:
-                    redirect_msg = "I'm here to help with your health and wellness journey! What would you like to know about nutrition, fitness, mental health, or healthy habits?"
-                return False, redirect_msg
-            else:
-                return True, ""
-                
-        except Exception as e:
-            print(f"Validation error: {e}")
-            return True, ""
+        self._acquire_model_budget(self.validator_chat, validation_prompt)
+        response = call_with_deadline(lambda: self.validator_chat.send_message(
+            validation_prompt, record=f'Validate: "{user_input}"'), VALIDATOR_DEADLINE)
+        return parse_verdict(response.text)
+
+    @property
+    def conversation_memory(self) -> list:
+        return self._conversation_memory
+
+    @conversation_memory.setter
+    def conversation_memory(self, exchanges: list):
+        self._conversation_memory = exchanges
+        self._recent_context = None
 
     def _get_recent_context(self) -> str:
-        """Get recent conversation context for validation"""
-        if len(self.conversation_memory) <= 3:
-            return json.dumps(self.conversation_memory)
-        else:
-            return json.dumps(self.conversation_memory[-3:])  # Last 3 exchanges
+        """Get recent conversation context for validation.
+
+        Serialized once per change to memory; the validator and the coach prompt share it.
+        """
+        if self._recent_context is None:
+            self._recent_context = json.dumps([{**e.to_dict(), "date": e.date}
+                                               for e in self.conversation_memory[-3:]])  # Last 3 exchanges
+        return self._recent_context
+
+    def _get_recalled_context(self, user_input: str) -> list:
+        """Earlier exchanges relevant to this message, excluding the ones already in recent context"""
+        recent = {(e.timestamp, e.user) for e in self.conversation_memory[-3:]}
+        try:
+            recalled = self.recall.recall(user_input, k=RECALL_TOP_K + len(recent), max_bytes=RECALL_MAX_BYTES,
+                                          exclude=recent)
+        except Exception as e:
+            print(f"Recall error: {e}")
+            return []
+        return recalled[:RECALL_TOP_K]
 
     def _add_to_memory(self, user_msg: str, agent_response: str):
         """Add exchange to conversation memory"""
-        self.conversation_memory.append({
-            "user": user_msg,
-            "agent": agent_response,
-            "timestamp": time.time(),
-            "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        })
+        exchange = Exchange(user_msg, agent_response, time.time())
+        self._append_exchange(exchange)
+        self._journal("exchange", {"exchange": exchange.to_dict()})
+
+    def _append_exchange(self, exchange: Exchange):
+        self.conversation_memory.append(exchange)
+        self._recent_context = None
+        try:
+            self.recall.add(exchange.to_dict())
+        except Exception as e:
+            print(f"Recall index error: {e}")
         
         if len(self.conversation_memory) > 20:
             self.conversation_memory = self.conversation_memory[-20:]
@@ -279,108 +478,476 @@ Is this appropriate for a wellness coach?"""
     def update_user_profile(self, profile_data: Dict[str, Any]):
         """Update user profile information"""
         self.user_profile.update(profile_data)
+        self._profile_version += 1
+        self._journal("profile", {"data": profile_data})
+        self._interests_changed()
         
-    def add_wellness_goal(self, goal: str, target_date: str = None, category: str = "general"):
-        """Add a wellness goal for the user"""
-        goal_data = {
-            "goal": goal,
-            "category": category,
-            "created_date": datetime.now().strftime("%Y-%m-%d"),
-            "target_date": target_date,
-            "status": "active",
-            "progress": 0
-        }
-        self.wellness_goals.append(goal_data)
+    def add_wellness_goal(self, goal: str, target_date: str = None, category: str = "general",
+                          metric: str = None, target_value: float = None, direction: str = None):
+        """Add a wellness goal for the user.
+
+        A goal that names a tracked metric and a number ("walk 10000 steps") is
+        linked to that metric, so tracking it updates the goal's progress. The
+        link is only made when it is clear whether the metric has to go up or
+        down (from the wording, or the current value against the target).
+        """
+        if metric is None:
+            metric, target_value = infer_metric_link(goal, self.metrics.metrics())
+        baseline = self.metrics.latest(metric) if metric else None
+        if metric and direction is None:
+            direction = infer_direction(goal, target_value, baseline)
+        if direction is None:
+            metric = target_value = None
+        record = self.goals.add(goal, category, target_date, created_date=datetime.now().strftime("%Y-%m-%d"),
+                                metric=metric, target_value=target_value, direction=direction, baseline=baseline)
+        self._journal("goal", {"goal": record.to_dict()})
+        self._interests_changed()
+        return record
+
+    def update_goal_status(self, goal_id: int, status: str):
+        """Mark a goal completed, abandoned or active again"""
+        record = self.goals.set_status(goal_id, status)
+        self._journal("goal_update", {"id": goal_id, "status": status})
+        self._interests_changed()
+        return record
+
+    @property
+    def wellness_goals(self) -> List[Dict[str, Any]]:
+        """Goals as a list of dicts (a snapshot, not a live view)"""
+        return self.goals.to_list()
+
+    @wellness_goals.setter
+    def wellness_goals(self, goals: List[Dict[str, Any]]):
+        # The new store continues the old one's version, so prompt sections cached by version stay correct
+        store = GoalStore.from_list(goals)
+        store.version += self.goals.version + 1
+        self.goals = store
+
+    def _interests_changed(self):
+        """Prefetch searches for the new profile/goals while the user is between turns"""
+        if self.prefetcher is not None:
+            self.prefetcher.schedule(self)
+            self.prefetch_pending = False
         
     def track_daily_metric(self, metric: str, value: Any, date: str = None):
         """Track daily wellness metrics"""
         if date is None:
             date = datetime.now().strftime("%Y-%m-%d")
             
-        if date not in self.daily_tracking:
-            self.daily_tracking[date] = {}
-            
-        self.daily_tracking[date][metric] = value
+        if self.metrics.record(metric, value, date):
+            self.goals.on_metric(metric, value)
+        self._journal("metric", {"metric": metric, "value": value, "date": date})
+
+    @property
+    def daily_tracking(self) -> Dict[str, Dict[str, Any]]:
+        """Tracked metrics in {date: {metric: value}} form (a snapshot, not a live view)"""
+        return self.metrics.to_dict()
+
+    @daily_tracking.setter
+    def daily_tracking(self, data: Dict[str, Dict[str, Any]]):
+        store = MetricsStore.from_dict(data)
+        store.version += self.metrics.version + 1
+        self.metrics = store
 
     def get_progress_summary(self) -> Dict[str, Any]:
         """Get a summary of user's wellness progress"""
         return {
-            "active_goals": len([g for g in self.wellness_goals if g["status"] == "active"]),
-            "completed_goals": len([g for g in self.wellness_goals if g["status"] == "completed"]),
-            "tracking_days": len(self.daily_tracking),
-            "recent_activity": list(self.daily_tracking.keys())[-7:] if self.daily_tracking else []
+            "active_goals": self.goals.count("active"),
+            "completed_goals": self.goals.count("completed"),
+            "overdue_goals": len(self.goals.overdue()),
+            "goal_reminders": self.goals.reminders(GOAL_REMINDER_DAYS, limit=GOAL_REMINDER_LIMIT),
+            "tracking_days": self.metrics.tracking_days,
+            "recent_activity": self.metrics.recent_dates(7)
         }
 
-    def chat(self, user_input: str) -> str:
-        """Main chat method - handles user input and returns response"""
-        
+    async def _run_blocking(self, func, *args):
+        """Run a blocking call on the shared worker pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_BLOCKING_EXECUTOR, func, *args)
+
+    def _goals_section(self, drop_stale: bool = False) -> str:
+        """Active goals only; finished ones are already counted in the progress summary"""
+        active = self.goals.by_status("active")
+        if drop_stale:
+            cutoff = date.today().toordinal() - STALE_GOAL_DAYS
+            active = [g for g in active if g.deadline is None or g.deadline >= cutoff]
+        goals = [{k: v for k, v in g.to_dict().items() if k != "id"} for g in active]
+        return f"Current Wellness Goals: {compact_json(goals) if goals else 'None set'}"
+
+    def _search_section(self, search_results: Dict[str, Any], snippet_chars: int, limit: int) -> str:
+        results = [{"title": r.get("title"), "url": r.get("url"), "snippet": truncate(r.get("snippet", ""), snippet_chars),
+                    "source": r.get("source"), "trust": r.get("trust_score")}
+                   for r in search_results.get("results", [])[:limit]]
+        return f"""CURRENT RESEARCH & INFORMATION (from search):
+Query: {search_results.get('query', 'N/A')}
+Sources found: {len(search_results.get('results', []))}
+
+Search Results:
+{compact_json(results)}
+
+Please incorporate this current information into your response when relevant. Always cite sources when using search information."""
+
+    def _build_context_prompt(self, user_input: str, search_results: Optional[Dict[str, Any]]) -> str:
+        """Assemble the context prompt sent to the wellness agent within the prompt token budget.
+
+        Sections derived from the profile, goals and metrics are only
+        re-serialized after those change. When the prompt is over budget, search
+        snippets are shortened first, then stale goals, recalled exchanges,
+        tracking trends and all but the top search result are dropped.
+        """
+        builder = self.context_builder
+        today = date.today().toordinal()
+        goals_key = (self.goals.version, today)
+        metrics_key = (self.metrics.version, today)
+        recalled = self._get_recalled_context(user_input)
+        has_search = bool(search_results) and "error" not in search_results
+
+        sections = [
+            ("message", f'User message: "{user_input}"'),
+            ("recent", f"Recent conversation: {self._get_recent_context()}"),
+            ("recall", f"Relevant earlier conversations: {compact_json(recalled)}" if recalled else ""),
+            ("profile", builder.section("profile", self._profile_version, lambda: (
+                f"User Profile: {compact_json(self.user_profile) if self.user_profile else 'Not yet established'}"))),
+            ("goals", builder.section("goals", goals_key, self._goals_section)),
+            ("progress", builder.section("progress", goals_key + metrics_key, lambda: (
+                f"Recent Progress: {compact_json(self.get_progress_summary())}"))),
+            ("tracking", builder.section("tracking", metrics_key, lambda: (
+                f"Daily Tracking Data (last 7 days): {compact_json(self.metrics.window(7))}"))),
+            ("trends", builder.section("trends", metrics_key, lambda: (
+                f"Tracking Trends (7/30-day averages, streaks, trend per day): {compact_json(self.metrics.summary())}"))),
+            ("search", self._search_section(search_results, SNIPPET_CHARS, PROMPT_SEARCH_RESULTS) if has_search else ""),
+            ("instructions", "Please respond as Dr. Wellness, keeping in mind our previous conversations and the user's "
+                             "wellness journey. Be supportive, personalized, and actionable in your response. If you used "
+                             "search results, mention the sources and cite them appropriately.")
+        ]
+        reducers = [
+            ("search", lambda: self._search_section(search_results, REDUCED_SNIPPET_CHARS, PROMPT_SEARCH_RESULTS)),
+            ("goals", lambda: self._goals_section(drop_stale=True)),
+            ("recall", lambda: ""),
+            ("trends", lambda: ""),
+            ("search", lambda: self._search_section(search_results, REDUCED_SNIPPET_CHARS, 1))
+        ]
+        return builder.build(sections, reducers)
+
+    def _generate_uncommitted(self, context_prompt: str) -> str:
+        """Generate a reply without touching the chat history.
+
+        The caller commits the turn once the input has been validated, or
+        simply drops the reply.
+        """
+        self._acquire_model_budget(self.wellness_chat, context_prompt)
+        return self.wellness_chat.generate(context_prompt).text
+
+    def _acquire_model_budget(self, chat: RollingChatSession, prompt: str):
+        """Wait for Gemini budget: this prompt, the history sent with it and the expected reply"""
+        tokens = estimate_tokens(prompt) + chat.token_count + GENERATION_TOKEN_ALLOWANCE
+        self.gemini_limiter.acquire(tokens, self.priority)
+
+    def _traced_validate(self, trace: TurnTrace, user_input: str, intent: Intent) -> tuple[bool, str]:
+        with trace.stage("validation") as stage:
+            verdict = self._is_valid_input(user_input, intent)
+            stage.set(tier=self.validator.last_tier, valid=verdict[0])
+        return verdict
+
+    def _traced_search(self, trace: TurnTrace, query: str) -> Dict[str, Any]:
+        with trace.stage("search") as stage:
+            results, source = self._fanout_search(query) if self.search_fanout else self._search(query)
+            stage.set(cache_hit=source == "cache", coalesced=source == "coalesced", stale=source == "stale",
+                      results=len(results.get("results", [])))
+            if results.get("sub_queries"):
+                stage.set(sub_queries=len(results["sub_queries"]))
+            if "error" in results:
+                stage.set(error="SearchFailed")
+        return results
+
+    def _traced_prompt(self, trace: TurnTrace, user_input: str, search_results: Optional[Dict[str, Any]]) -> str:
+        with trace.stage("prompt_assembly") as stage:
+            context_prompt = self._build_context_prompt(user_input, search_results)
+            stage.set(prompt_bytes=len(context_prompt.encode("utf-8")), prompt_tokens=estimate_tokens(context_prompt),
+                      history_tokens=self.wellness_chat.token_count, sections=self.context_builder.last_report)
+            if self.context_builder.last_reduced:
+                stage.set(reduced=self.context_builder.last_reduced)
+        return context_prompt
+
+    def _traced_generate(self, trace: TurnTrace, context_prompt: str) -> str:
+        with trace.stage("generation") as stage:
+            reply = self._generate_uncommitted(context_prompt)
+            # Without streaming the first token arrives with the last one
+            stage.set(ttft_ms=round((time.perf_counter() - stage.start) * 1000, 3), output_tokens=estimate_tokens(reply))
+        return reply
+
+    def _lookup_answer(self, trace: TurnTrace, user_input: str, intent: Intent) -> Optional[str]:
+        """Cached answer to a similar generic question; personal questions always miss"""
+        if self.answer_cache is None or intent.personal:
+            return None
+        with trace.stage("answer_cache") as stage:
+            answer = self.answer_cache.get(user_input, self.user_profile)
+            stage.set(answer_hit=answer is not None)
+        return answer
+
+    def _generic_context(self) -> bool:
+        """True when a prompt built now says nothing about this user beyond the profile fields answers are keyed on.
+
+        Only replies generated from such a prompt go into the answer cache,
+        which is shared by every user with the same profile fingerprint: the
+        model never saw their conversation, recalled exchanges, goals or tracking.
+        """
+        chat = self._wellness_chat
+        return (not self.conversation_memory and not len(self.recall) and not len(self.goals)
+                and not len(self.metrics) and set(self.user_profile) <= set(PROFILE_KEY_FIELDS)
+                and (chat is None or not (chat.turns or chat.summary_lines)))
+
+    def _store_answer(self, user_input: str, intent: Intent, reply: str, generic: bool):
+        if self.answer_cache is None or intent.personal or not generic:
+            return
+        # A reply that quotes the user's goals or tracked data is theirs alone
+        matcher = personal_reply_matcher([g.goal for g in self.goals], self.metrics.metrics())
+        if matcher.find(tokenize(reply)):
+            return
+        self.answer_cache.set(user_input, self.user_profile, reply)
+
+    def _commit_turn(self, trace: TurnTrace, user_input: str, reply: str, footer: str = ""):
+        with trace.stage("memory_update"):
+            self.wellness_chat.commit(user_input, reply)
+            self._add_to_memory(user_input, reply + footer)
+
+    async def _speculative_generate(self, trace: TurnTrace, user_input: str, search_task: Optional[asyncio.Task]):
+        """Wait for search (if any) and generate a reply before validation is known"""
+        search_results = None
+        if search_task is not None:
+            search_results = await search_task
+            if "error" not in search_results:
+                print(f"✅ Found {len(search_results.get('results', []))} relevant sources")
+
+        # Prompt assembly queries the recall index, so it stays off the event loop too
+        context_prompt = await self._run_blocking(self._traced_prompt, trace, user_input, search_results)
+        reply = await self._run_blocking(self._traced_generate, trace, context_prompt)
+        return search_results, reply
+
+    async def achat(self, user_input: str, intent: Intent = None) -> str:
+        """Async chat method - validation, search and generation run concurrently.
+
+        Input the local rules can decide is validated before anything else
+        starts, so refused input never reaches search or Gemini. Otherwise the
+        validator call and the search start at the same moment and the reply
+        is generated speculatively. If the validator rejects the input, the
+        speculative work is cancelled and its result is never committed.
+        """
         user_input = user_input.strip()
         if not user_input:
             return "I'm here to support your wellness journey! What would you like to talk about today?"
-        
-        is_valid, validation_msg = self._is_valid_input(user_input)
-        
-        if not is_valid:
-            return validation_msg
-        
-        try:
-            search_results = None
-            if self._should_search(user_input):
+
+        turn_start = time.perf_counter()
+        self.last_turn_error = None
+        if self.prefetcher is not None:
+            self.prefetcher.cancel(self)  # the user is here; their turn gets the search budget
+        with self.instrumentation.turn(mode="chat") as trace:
+            if intent is None:
+                intent = self.router.route(user_input)
+
+            cached = self._lookup_answer(trace, user_input, intent)
+            if cached is not None:
+                # Similar questions can still differ in what makes them unsafe, so validation always runs
+                is_valid, validation_msg = await self._run_blocking(self._traced_validate, trace, user_input, intent)
+                trace.set(valid=is_valid, searched=False, answer_cached=True)
+                if not is_valid:
+                    return validation_msg
+                await self._run_blocking(self._commit_turn, trace, user_input, cached)
+                total = time.perf_counter() - turn_start
+                self.last_turn_timing = {"ttft": total, "total": total, "streamed": False, "cached": True}
+                return cached
+
+            validation_task = None
+            if self.validator.local.classify(intent) is not None:
+                # The rules decide this input without I/O: refuse it before any search or generation starts
+                is_valid, validation_msg = self._traced_validate(trace, user_input, intent)
+                if not is_valid:
+                    trace.set(valid=False, searched=False)
+                    return validation_msg
+            else:
+                validation_task = asyncio.create_task(
+                    self._run_blocking(self._traced_validate, trace, user_input, intent)
+                )
+
+            search_task = None
+            if intent.needs_search:
                 print("🔍 Searching for latest health information...")
-                search_results = self.search_health_info(user_input)
-                
-                if "error" not in search_results:
-                    print(f"✅ Found {len(search_results.get('results', []))} relevant sources")
-            
-            context_prompt = f"""User message: "{user_input}"
+                search_task = asyncio.create_task(
+                    self._run_blocking(self._traced_search, trace, intent.search_topic or user_input)
+                )
 
-Recent conversation: {self._get_recent_context()}
+            generic = self._generic_context()
+            generation_task = asyncio.create_task(self._speculative_generate(trace, user_input, search_task))
 
-User Profile: {json.dumps(self.user_profile) if self.user_profile else "Not yet established"}
+            if validation_task is not None:
+                is_valid, validation_msg = await validation_task
+            trace.set(valid=is_valid, searched=search_task is not None)
 
-Current Wellness Goals: {json.dumps(self.wellness_goals) if self.wellness_goals else "None set"}
+            if not is_valid:
+                generation_task.cancel()
+                if search_task is not None:
+                    search_task.cancel()
+                await asyncio.gather(generation_task, return_exceptions=True)
+                return validation_msg
 
-Recent Progress: {json.dumps(self.get_progress_summary())}
+            try:
+                search_results, agent_response = await asyncio.wait_for(generation_task, GENERATION_DEADLINE)
 
-Daily Tracking Data (last 7 days): {json.dumps(dict(list(self.daily_tracking.items())[-7:]))}"""
+                # Commit the speculative turn now that the input is known to be valid;
+                # the sources footer is only added to the reply the user sees. The
+                # journal, snapshot and recall writes block, so they run on the pool
+                footer = self._sources_footer(search_results)
+                await self._run_blocking(self._commit_turn, trace, user_input, agent_response, footer)
+                agent_response += footer
+                await self._run_blocking(self._store_answer, user_input, intent, agent_response, generic)
 
-            if search_results and "error" not in search_results:
-                context_prompt += f"""
+                # Without streaming the first token reaches the user with the last one
+                total = time.perf_counter() - turn_start
+                self.last_turn_timing = {"ttft": total, "total": total, "streamed": False}
 
-CURRENT RESEARCH & INFORMATION (from search):
-Query: {search_results.get('query', 'N/A')}
-Sources found: {len(search_results.get('results', []))}
+                return agent_response
 
-Search Results:
-{json.dumps(search_results.get('results', [])[:3], indent=2)}
+            except Exception as e:
+                error_msg = "I'm having a small technical hiccup. Could you try asking that again? I'm here to help with your wellness journey!"
+                print(f"Chat error: {e}")
+                trace.set(error=type(e).__name__)
+                self.last_turn_error = type(e).__name__
+                return error_msg
 
-Please incorporate this current information into your response when relevant. Always cite sources when using search information."""
+    def chat(self, user_input: str) -> str:
+        """Main chat method - handles user input and returns response.
 
-            context_prompt += """
+        Safe to call with an event loop already running in this thread: the
+        turn then runs on a separate loop in a worker thread (async callers
+        should prefer `await achat()`, which does not block their loop).
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.achat(user_input))
+        return _SYNC_CHAT_EXECUTOR.submit(lambda: asyncio.run(self.achat(user_input))).result()
 
-Please respond as Dr. Wellness, keeping in mind our previous conversations and the user's wellness journey. Be supportive, personalized, and actionable in your response. If you used search results, mention the sources and cite them appropriately."""
+    def chat_stream(self, user_input: str, intent: Intent = None):
+        """Streaming chat method - yields response chunks as Gemini produces them.
 
-            response = self.wellness_chat.send_message(context_prompt)
-            agent_response = response.text
-            
-            # Add search info to response if sources were used
-            if search_results and "error" not in search_results and search_results.get('results'):
-                agent_response += f"\n\n📚 Sources: Based on current research from {len(search_results['results'])} sources including {', '.join(set([r['source'] for r in search_results['results'][:3]]))}."
-            
-            # Add to conversation memory
-            self._add_to_memory(user_input, agent_response)
-            
-            return agent_response
-            
-        except Exception as e:
-            error_msg = "I'm having a small technical hiccup. Could you try asking that again? I'm here to help with your wellness journey!"
-            print(f"Chat error: {e}")
-            return error_msg
+        Input the local rules can decide is validated before the search starts;
+        otherwise validation and search run concurrently. Generation starts only
+        once the input is known to be valid. The sources footer is yielded last
+        and the turn is written to memory only once the stream has finished. As
+        in achat(), search, the first chunk and the whole stream must arrive
+        within GENERATION_DEADLINE of the input being validated. Timings end up
+        in last_turn_timing.
+        """
+        user_input = user_input.strip()
+        if not user_input:
+            yield "I'm here to support your wellness journey! What would you like to talk about today?"
+            return
+
+        turn_start = time.perf_counter()
+        self.last_turn_error = None
+        if self.prefetcher is not None:
+            self.prefetcher.cancel(self)  # the user is here; their turn gets the search budget
+        with self.instrumentation.turn(mode="stream") as trace:
+            if intent is None:
+                intent = self.router.route(user_input)
+
+            cached = self._lookup_answer(trace, user_input, intent)
+            if cached is not None:
+                is_valid, validation_msg = self._traced_validate(trace, user_input, intent)
+                trace.set(valid=is_valid, searched=False, answer_cached=True)
+                if not is_valid:
+                    yield validation_msg
+                    return
+                yield cached
+                self._commit_turn(trace, user_input, cached)
+                total = time.perf_counter() - turn_start
+                self.last_turn_timing = {"ttft": total, "total": total, "streamed": True, "cached": True}
+                return
+
+            generic = self._generic_context()
+            validation_future = None
+            if self.validator.local.classify(intent) is not None:
+                # The rules decide this input without I/O: refuse it before the search starts
+                is_valid, validation_msg = self._traced_validate(trace, user_input, intent)
+                if not is_valid:
+                    trace.set(valid=False, searched=False)
+                    yield validation_msg
+                    return
+            else:
+                validation_future = _BLOCKING_EXECUTOR.submit(self._traced_validate, trace, user_input, intent)
+
+            search_future = None
+            if intent.needs_search:
+                print("🔍 Searching for latest health information...")
+                search_future = _BLOCKING_EXECUTOR.submit(self._traced_search, trace, intent.search_topic or user_input)
+
+            if validation_future is not None:
+                is_valid, validation_msg = validation_future.result()
+            trace.set(valid=is_valid, searched=search_future is not None)
+            if not is_valid:
+                if search_future is not None:
+                    search_future.cancel()
+                yield validation_msg
+                return
+
+            deadline_at = time.monotonic() + GENERATION_DEADLINE
+            try:
+                search_results = None
+                if search_future is not None:
+                    search_results = search_future.result(timeout=max(0.0, deadline_at - time.monotonic()))
+                    if "error" not in search_results:
+                        print(f"✅ Found {len(search_results.get('results', []))} relevant sources")
+
+                context_prompt = self._traced_prompt(trace, user_input, search_results)
+
+                def start_stream():
+                    self._acquire_model_budget(self.wellness_chat, context_prompt)
+                    return self.wellness_chat.generate(context_prompt, stream=True)
+
+                chunks = []
+                ttft = None
+                with trace.stage("generation") as stage:
+                    for chunk in iter_with_deadline(start_stream, max(0.0, deadline_at - time.monotonic())):
+                        try:
+                            text = chunk.text
+                        except ValueError:
+                            continue  # chunks without text parts (e.g. the final finish-reason chunk)
+                        if not text:
+                            continue
+                        if ttft is None:
+                            ttft = time.perf_counter() - turn_start
+                            stage.set(ttft_ms=round((time.perf_counter() - stage.start) * 1000, 3))
+                        chunks.append(text)
+                        yield text
+                    stage.set(output_tokens=estimate_tokens("".join(chunks)))
+
+                footer = self._sources_footer(search_results)
+                if footer:
+                    yield footer
+
+                reply = "".join(chunks)
+                self._commit_turn(trace, user_input, reply, footer)
+                self._store_answer(user_input, intent, reply + footer, generic)
+
+                total = time.perf_counter() - turn_start
+                self.last_turn_timing = {"ttft": ttft if ttft is not None else total, "total": total, "streamed": True}
+
+            except Exception as e:
+                print(f"Chat error: {e}")
+                trace.set(error=type(e).__name__)
+                self.last_turn_error = type(e).__name__
+                yield "I'm having a small technical hiccup. Could you try asking that again? I'm here to help with your wellness journey!"
+
+    def _sources_footer(self, search_results: Optional[Dict[str, Any]]) -> str:
+        """Citation line appended to replies that used search results"""
+        if search_results and "error" not in search_results and search_results.get('results'):
+            return f"\n\n📚 Sources: Based on current research from {len(search_results['results'])} sources including {', '.join(set([r['source'] for r in search_results['results'][:3]]))}."
+        return ""
 
     def manual_search(self, query: str) -> str:
         """Manual search function for users to trigger searches"""
         print(f"🔍 Searching for: {query}")
-        results = self.search_health_info(query)
+        results = self.search_health_info(query, fanout=True)
         
         if "error" in results:
             return f"❌ Search error: {results['error']}"
@@ -399,14 +966,57 @@ Please respond as Dr. Wellness, keeping in mind our previous conversations and t
         
         return response
 
+    def get_token_usage(self) -> Dict[str, int]:
+        """Estimated tokens of chat history currently sent with each request"""
+        return {
+            "wellness_chat": self.wellness_chat.token_count,
+            "validator_chat": self.validator_chat.token_count
+        }
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Approximate bytes of per-session state by component (shared caches and models excluded)"""
+        chats = [chat for chat in (self._wellness_chat, self._validator_chat) if chat is not None]
+        usage = {
+            "conversation_memory": deep_sizeof(self.conversation_memory),
+            "goals": deep_sizeof(self.goals),
+            "metrics": deep_sizeof(self.metrics),
+            "profile": deep_sizeof(self.user_profile),
+            "chats": sum(deep_sizeof((chat.summary_lines, chat.turns)) for chat in chats),
+            "context_cache": deep_sizeof(self.context_builder),
+            "recall_index": self.recall.size_bytes()
+        }
+        usage["total"] = sum(usage.values())
+        return usage
+
     def get_conversation_history(self) -> list:
         """Get the full conversation history"""
-        return self.conversation_memory.copy()
+        return [{**e.to_dict(), "date": e.date} for e in self.conversation_memory]
 
     def clear_conversation(self):
         """Clear conversation history and start fresh"""
         self.conversation_memory = []
+        self.recall.clear()
         self._setup_conversational_agents()
+        self._journal("clear", {})
+
+    def _session_state(self) -> Dict[str, Any]:
+        """Complete session state as saved to disk"""
+        return {
+            "user_profile": self.user_profile,
+            "conversation_memory": [e.to_dict() for e in self.conversation_memory],
+            "wellness_goals": self.wellness_goals,
+            "daily_tracking": self.daily_tracking,
+            "session_timestamp": time.time(),
+            "session_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+    def _restore_session_state(self, save_data: Dict[str, Any]):
+        self.user_profile = save_data.get("user_profile", {})
+        self._profile_version += 1
+        self.conversation_memory = [Exchange.from_dict(e) for e in save_data.get("conversation_memory", [])]
+        self.wellness_goals = save_data.get("wellness_goals", [])
+        self.daily_tracking = save_data.get("daily_tracking", {})
+        self.prefetch_pending = bool(self.user_profile or len(self.goals))
 
     def save_session(self, filename: str = None):
         """Save complete session to file"""
@@ -414,17 +1024,8 @@ Please respond as Dr. Wellness, keeping in mind our previous conversations and t
             filename = f"wellness_session_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
             
         try:
-            save_data = {
-                "user_profile": self.user_profile,
-                "conversation_memory": self.conversation_memory,
-                "wellness_goals": self.wellness_goals,
-                "daily_tracking": self.daily_tracking,
-                "session_timestamp": time.time(),
-                "session_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            }
-            
-            with open(filename, 'w') as f:
-                json.dump(save_data, f, indent=2)
+            # Temp file + rename, so a crash mid-write never corrupts an existing save
+            atomic_write_json(filename, self._session_state())
             return f"Wellness session saved to {filename}"
         except Exception as e:
             return f"Error saving session: {e}"
@@ -435,15 +1036,87 @@ Please respond as Dr. Wellness, keeping in mind our previous conversations and t
             with open(filename, 'r') as f:
                 save_data = json.load(f)
             
-            self.user_profile = save_data.get("user_profile", {})
-            self.conversation_memory = save_data.get("conversation_memory", [])
-            self.wellness_goals = save_data.get("wellness_goals", [])
-            self.daily_tracking = save_data.get("daily_tracking", {})
+            self._restore_session_state(save_data)
+            # Loaded exchanges stay recallable after they leave the memory window
+            for exchange in self.conversation_memory:
+                try:
+                    self.recall.add(exchange.to_dict())
+                except Exception as e:
+                    print(f"Recall index error: {e}")
+            # With autosave on, the loaded state replaces the journaled one (a restart would otherwise revert it)
+            if self.journal is not None:
+                self.journal.snapshot(self._session_state())
             
             return f"Wellness session loaded from {filename}"
         except Exception as e:
             return f"Error loading session: {e}"
 
+    def enable_autosave(self, base_path: str, snapshot_every: int = 200):
+        """Journal every change to base_path.* and restore any state already journaled there.
+
+        Each exchange, metric, goal and profile change is appended to a compact
+        journal (O(change) per save); a full snapshot is written atomically every
+        `snapshot_every` changes so loading only replays a short tail.
+        """
+        try:
+            journal = SessionJournal(base_path, snapshot_every=snapshot_every)
+            # The recall index lives next to the journal; replayed exchanges are de-duplicated by it
+            directory, name = os.path.split(os.path.abspath(base_path))
+            self.recall.close()
+            self.recall = RecallIndex(os.path.join(directory, RECALL_DB_NAME), stopwords=self.router.stopwords,
+                                      owner=name)
+            if os.path.exists(f"{base_path}.recall.db"):
+                self.recall.absorb(f"{base_path}.recall.db")
+            restored = journal.exists()
+            if restored:
+                state, tail = journal.load()
+                if state is not None:
+                    self._restore_session_state(state)
+                for entry in tail:
+                    self._apply_journal_entry(entry)
+            self.journal = journal
+            return f"Autosave {'resumed' if restored else 'enabled'} at {base_path}"
+        except Exception as e:
+            return f"Error enabling autosave: {e}"
+
+    def close_autosave(self):
+        """Write a final snapshot and stop journaling"""
+        if self.journal is not None:
+            self.journal.snapshot(self._session_state())
+            self.journal.close()
+            self.journal = None
+            self.recall.close()
+            self.recall = RecallIndex(stopwords=self.router.stopwords)
+
+    def _journal(self, op: str, data: Dict[str, Any]):
+        if self.journal is None:
+            return
+        try:
+            self.journal.append(op, data)
+            if self.journal.needs_snapshot():
+                self.journal.snapshot(self._session_state())
+        except Exception as e:
+            print(f"Autosave error: {e}")
+
+    def _apply_journal_entry(self, entry: Dict[str, Any]):
+        """Replay one journaled change (journaling is off while replaying)"""
+        op = entry.get("op")
+        if op == "exchange":
+            self._append_exchange(Exchange.from_dict(entry["exchange"]))
+        elif op == "profile":
+            self.user_profile.update(entry["data"])
+            self._profile_version += 1
+        elif op == "goal":
+            self.goals.add_dict(entry["goal"])
+        elif op == "goal_update":
+            self.goals.set_status(entry["id"], entry["status"])
+        elif op == "metric":
+            if self.metrics.record(entry["metric"], entry["value"], entry["date"]):
+                self.goals.on_metric(entry["metric"], entry["value"])
+        elif op == "clear":
+            self.conversation_memory = []
+            self.recall.clear()
+
     def quick_setup_profile(self):
         """Interactive profile setup"""
         print("\n🌟 Let's set up your wellness profile!")
@@ -500,6 +1173,11 @@ def main():
         print(" Initializing Dr. Wellness with Internet Search...")
         coach = PersonalWellnessCoach(API_KEY, SERPER_API_KEY)
         
+        # Optional crash-safe autosave: every turn is journaled as it happens
+        autosave_path = os.getenv("WELLNESS_AUTOSAVE")
+        if autosave_path:
+            print(f" {coach.enable_autosave(autosave_path)}")
+        
         print("\n" + "="*70)
         print(" DR. WELLNESS - Your Personal Health & Wellness Coach")
         print(" NOW WITH REAL-TIME HEALTH RESEARCH & INFORMATION!")
@@ -534,23 +1212,29 @@ def main():
         while True:
             try:
                 user_input = input("\n You: ").strip()
+                intent = coach.router.route(user_input)
+                command = intent.command
                 
-                if user_input.lower() in ['exit', 'quit', 'bye']:
+                if command == 'exit':
+                    coach.close_autosave()
                     print(" Dr. Wellness: It's been wonderful supporting your wellness journey! Remember, every small step counts. Keep up the great work and feel free to return anytime. Stay healthy! 🌟")
                     break
                 
-                elif user_input.lower() == 'setup':
+                elif command == 'setup':
                     coach.quick_setup_profile()
                     response = coach.chat("I've updated your profile! Now I can provide more personalized guidance. What would you like to focus on first?")
                     print(f"\n Dr. Wellness: {response}")
                     continue
                 
-                elif user_input.lower() == 'goals':
-                    if coach.wellness_goals:
+                elif command == 'goals':
+                    if len(coach.goals):
                         print("\n Your Wellness Goals:")
-                        for i, goal in enumerate(coach.wellness_goals, 1):
-                            status_emoji = "✅" if goal["status"] == "completed" else "🎯"
-                            print(f"   {status_emoji} {goal['goal']} ({goal['category']}) - {goal['status']}")
+                        for goal in coach.goals:
+                            status_emoji = "✅" if goal.status == "completed" else "🎯"
+                            progress = f", {goal.progress}%" if goal.metric else ""
+                            print(f"   {status_emoji} [{goal.id}] {goal.goal} ({goal.category}) - {goal.status}{progress}")
+                        for reminder in coach.goals.reminders(GOAL_REMINDER_DAYS):
+                            print(f"   ⏰ {reminder}")
                     else:
                         print("\n No goals set yet. Let's create some!")
                         goal = input("What wellness goal would you like to set? ").strip()
@@ -559,7 +1243,7 @@ def main():
                             print(f" Goal added: {goal}")
                     continue
                 
-                elif user_input.lower() == 'track':
+                elif command == 'track':
                     print("\n Daily Wellness Tracking")
                     print("What would you like to track today?")
                     print("Examples: water intake, steps, mood (1-10), sleep hours, exercise minutes")
@@ -572,18 +1256,20 @@ def main():
                             print(f" Tracked: {metric} = {value}")
                     continue
                 
-                elif user_input.lower() == 'progress':
+                elif command == 'progress':
                     summary = coach.get_progress_summary()
                     print("\nYour Wellness Progress:")
                     print(f"   Active Goals: {summary['active_goals']}")
                     print(f"   Completed Goals: {summary['completed_goals']}")
+                    for reminder in summary['goal_reminders']:
+                        print(f"   ⏰ {reminder}")
                     print(f"   Days Tracked: {summary['tracking_days']}")
                     if summary['recent_activity']:
                         print(f"   Recent Activity: {', '.join(summary['recent_activity'])}")
                     continue
                 
-                elif user_input.lower().startswith('search'):
-                    search_query = user_input.replace('search', '').strip()
+                elif command == 'search':
+                    search_query = intent.argument
                     if search_query:
                         result = coach.manual_search(search_query)
                         print(f"\n{result}")
@@ -594,13 +1280,13 @@ def main():
                             print(f"\n{result}")
                     continue
                 
-                elif user_input.lower() == 'save':
+                elif command == 'save':
                     result = coach.save_session()
                     print(f"\n💾 {result}")
                     continue
                 
-                elif user_input.lower().startswith('load'):
-                    filename = user_input.replace('load', '').strip()
+                elif command == 'load':
+                    filename = intent.argument
                     if not filename:
                         filename = input("Enter filename: ").strip()
                     if filename:
@@ -608,14 +1294,14 @@ def main():
                         print(f"\n📁 {result}")
                     continue
                 
-                elif user_input.lower() == 'clear':
+                elif command == 'clear':
                     coach.clear_conversation()
                     print("\n🔄 Conversation cleared! Starting fresh.")
                     greeting = coach.chat("Let's start fresh! How can I help you with your wellness journey today?")
                     print(f"\n🩺 Dr. Wellness: {greeting}")
                     continue
                 
-                elif user_input.lower() == 'history':
+                elif command == 'history':
                     history = coach.get_conversation_history()
                     print(f"\n📜 Recent Conversations ({len(history)} total):")
                     for i, exchange in enumerate(history[-5:], 1):  # Show last 5
@@ -626,8 +1312,14 @@ def main():
                 if not user_input:
                     continue
                 
-                response = coach.chat(user_input)
-                print(f"\n🩺 Dr. Wellness: {response}")
+                # Print the reply as it streams in; search progress messages come before the first chunk
+                started = False
+                for chunk in coach.chat_stream(user_input, intent):
+                    if not started:
+                        print("\n🩺 Dr. Wellness: ", end="", flush=True)
+                        started = True
+                    print(chunk, end="", flush=True)
+                print()
                 
             except KeyboardInterrupt:
                 print("\n\n🩺 Dr. Wellness: Take care of yourself! Remember, wellness is a journey, not a destination. Come back anytime! 🌟")
@@ -641,4 +1333,12 @@ def main():
         print("Please check your API keys and try again.")
 
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        # Multi-user HTTP/WebSocket mode; imported lazily so the CLI does not need aiohttp
+        from server import main as serve
+        serve(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from batch import main as batch
+        batch(sys.argv[2:])
+    else:
+        main()
@@ -0,0 +1,207 @@
+"""Offline batch runner: replay a JSONL file of user messages through many coach sessions.
+
+    python app.py batch input.jsonl --output results.jsonl --concurrency 32
+
+Each input line is {"user_id": ..., "message": ..., "id": optional}. Lines are
+streamed, so the input can be far larger than memory. Messages for the same
+user run in input order against one persistent session; different users run
+concurrently. Every result is appended to the output JSONL as soon as it is
+ready, and the output doubles as the checkpoint: rerunning the same command
+skips every line already answered there. Each record has a "status" of "ok",
+"failed" or "invalid"; failed lines (errors, or turns that only got the
+coach's fallback reply) are run again, and their new record is appended.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Dict, Any, Optional, Set
+
+from rate_limiter import BATCH
+from server import SessionManager
+
+
+def completed_lines(output_path: str) -> Set[int]:
+    """Input line numbers already answered (or permanently invalid) in an existing output file"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for raw in f:
+            try:
+                record = json.loads(raw)
+                # Records written before statuses existed count as answered unless they carry an error
+                status = record.get("status", "failed" if "error" in record else "ok")
+                if status in ("ok", "invalid"):
+                    done.add(record["line"])
+            except (ValueError, KeyError, TypeError, AttributeError):
+                continue  # a line cut short by a crash; it is simply run again
+    return done
+
+
+def _ends_mid_line(path: str) -> bool:
+    if os.path.getsize(path) == 0:
+        return False
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b"\n"
+
+
+class RatePacer:
+    """Spaces turn starts so the batch never exceeds `per_minute` turns per minute"""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class BatchRunner:
+    """Bounded async worker pool over a SessionManager"""
+
+    def __init__(self, manager: SessionManager, input_path: str, output_path: str,
+                 concurrency: int = 32, max_rpm: float = 0, progress_every: int = 100):
+        self.manager = manager
+        self.input_path = input_path
+        self.output_path = output_path
+        self.concurrency = concurrency
+        self.pacer = RatePacer(max_rpm)
+        self.progress_every = progress_every
+        self.stats = {"read": 0, "skipped": 0, "ok": 0, "failed": 0, "invalid": 0}
+        self._out = None
+        # Per-user tail of the chain of that user's turns, so they run in input order
+        self._user_tails: Dict[str, asyncio.Future] = {}
+
+    def _parse(self, number: int, raw: str) -> Optional[Dict[str, Any]]:
+        try:
+            item = json.loads(raw)
+        except ValueError:
+            item = None
+        if not isinstance(item, dict) or not str(item.get("message", "")).strip():
+            self._write({"line": number, "status": "invalid", "error": "invalid input line"})
+            self.stats["invalid"] += 1
+            return None
+        item.setdefault("user_id", f"batch-{number}")
+        return item
+
+    def _write(self, record: Dict[str, Any]):
+        self._out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._out.flush()
+
+    async def _run_one(self, number: int, item: Dict[str, Any], previous: Optional[asyncio.Future]):
+        if previous is not None:
+            await asyncio.shield(previous)
+        await self.pacer.wait()
+        user_id = str(item["user_id"])
+        record = {"line": number, "id": item.get("id"), "user_id": user_id}
+        try:
+            result = await self.manager.chat(user_id, str(item["message"]))
+            record.update(result)
+            # A turn that ended in the fallback reply reports its error; it is not checkpointed as answered
+            record["status"] = "failed" if result.get("error") else "ok"
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+            record["status"] = "failed"
+        self.stats[record["status"]] += 1
+        self._write(record)
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            job = await queue.get()
+            if job is None:
+                return
+            number, item = job
+            user_id = str(item["user_id"])
+            previous = self._user_tails.get(user_id)
+            done = asyncio.get_running_loop().create_future()
+            self._user_tails[user_id] = done
+            try:
+                await self._run_one(number, item, previous)
+            finally:
+                done.set_result(None)
+                if self._user_tails.get(user_id) is done:
+                    del self._user_tails[user_id]
+                finished = self.stats["ok"] + self.stats["failed"]
+                if self.progress_every and finished and finished % self.progress_every == 0:
+                    self._report()
+
+    def _report(self):
+        elapsed = time.monotonic() - self._started
+        finished = self.stats["ok"] + self.stats["failed"]
+        print(f" Processed {finished} turns ({finished / elapsed:.1f}/s), {self.stats['skipped']} skipped from checkpoint")
+
+    async def run(self) -> Dict[str, Any]:
+        done = completed_lines(self.output_path)
+        self._started = time.monotonic()
+        # Bounded queue: the reader never gets more than a couple of batches ahead of the workers
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+
+        with open(self.output_path, "a", encoding="utf-8") as out:
+            self._out = out
+            if _ends_mid_line(self.output_path):
+                out.write("\n")  # finish a record cut short by a crash
+            workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.concurrency)]
+
+            with open(self.input_path, "r", encoding="utf-8") as f:
+                for number, raw in enumerate(f, 1):
+                    if not raw.strip():
+                        continue
+                    self.stats["read"] += 1
+                    if number in done:
+                        self.stats["skipped"] += 1
+                        continue
+                    item = self._parse(number, raw)
+                    if item is not None:
+                        await queue.put((number, item))
+
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+
+        self._report()
+        return {**self.stats, "elapsed_seconds": round(time.monotonic() - self._started, 3)}
+
+
+def main(argv=None):
+    """Entry point for `python app.py batch`"""
+    parser = argparse.ArgumentParser(prog="app.py batch", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL file of {\"user_id\", \"message\", \"id\"} lines")
+    parser.add_argument("--output", help="results JSONL (default: <input>.results.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=32, help="turns in flight at once")
+    parser.add_argument("--max-rpm", type=float, default=0, help="cap on turns started per minute (0 = no cap)")
+    parser.add_argument("--store-dir", default="batch_sessions", help="where batch sessions are journaled")
+    parser.add_argument("--max-resident", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        print(" Please set your GEMINI_API_KEY environment variable")
+        return
+    output = args.output or f"{os.path.splitext(args.input)[0]}.results.jsonl"
+
+    async def run():
+        # No admission timeout: batch work waits for a slot instead of being shed, and
+        # yields provider budget to interactive sessions sharing the same limits
+        manager = SessionManager(api_key, store_dir=args.store_dir, max_resident=args.max_resident,
+                                 max_inflight=args.concurrency, admission_timeout=None, priority=BATCH)
+        try:
+            return await BatchRunner(manager, args.input, output, concurrency=args.concurrency,
+                                     max_rpm=args.max_rpm).run()
+        finally:
+            await manager.close()
+
+    stats = asyncio.run(run())
+    print(f" Batch finished: {json.dumps(stats)}")
+    print(f" Results written to {output}")
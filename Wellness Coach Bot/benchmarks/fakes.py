@@ -0,0 +1,175 @@
+"""Local stand-ins for Gemini and Serper so the coach can be benchmarked without API keys"""
+import json
+import os
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, List, Optional
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "serper_fixture.json")
+
+_FILLER = ("Great question! Building a consistent routine is one of the most effective ways to improve "
+           "your wellbeing. Start small, track your progress and celebrate each win along the way. ")
+
+
+def _content_text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    parts = content.get("parts", []) if isinstance(content, dict) else getattr(content, "parts", [])
+    return "".join(p if isinstance(p, str) else getattr(p, "text", "") for p in parts)
+
+
+class FakeResponse:
+    """Mimics the bits of GenerateContentResponse the coach reads"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.candidates = [type("Candidate", (), {"content": {"role": "model", "parts": [text]}})()]
+
+
+class FakeChatSession:
+    def __init__(self, model: "FakeGenerativeModel", history: Optional[list] = None):
+        self.model = model
+        self.history = list(history or [])
+
+    def send_message(self, content, stream: bool = False):
+        contents = self.history + [{"role": "user", "parts": [content]}]
+        response = self.model.generate_content(contents)
+        self.history = contents + [{"role": "model", "parts": [response.text]}]
+        return response
+
+
+class FakeGenerativeModel:
+    """GenerativeModel stand-in with configurable latency, output size and streaming.
+
+    Latency is `latency + output_tokens * per_token_latency`; streamed replies
+    arrive in `stream_chunks` pieces spread over the same duration. Every call
+    records the bytes of prompt + history it was sent.
+    """
+
+    def __init__(self, model_name: str = "fake-gemini", system_instruction: str = None,
+                 latency: float = 0.05, per_token_latency: float = 0.0005, output_tokens: int = 200,
+                 stream_chunks: int = 8, recorder: "CallRecorder" = None):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.latency = latency
+        self.per_token_latency = per_token_latency
+        self.output_tokens = output_tokens
+        self.stream_chunks = stream_chunks
+        self.recorder = recorder or CallRecorder()
+        self.is_validator = bool(system_instruction and "validator" in system_instruction)
+
+    def start_chat(self, history: Optional[list] = None) -> FakeChatSession:
+        return FakeChatSession(self, history)
+
+    def count_tokens(self, contents):
+        text = "".join(_content_text(c) for c in (contents if isinstance(contents, list) else [contents]))
+        return type("CountTokensResponse", (), {"total_tokens": len(text) // 4 + 1})()
+
+    def _reply(self, prompt: str) -> str:
+        if prompt.startswith("Validate each numbered"):
+            return "\n".join(f"{n}. VALID" for n in range(1, len(re.findall(r'^\d+\. "', prompt, re.MULTILINE)) + 1))
+        if self.is_validator or prompt.startswith("Validate this user input"):
+            return "VALID"
+        words = _FILLER.split()
+        return " ".join(words[i % len(words)] for i in range(int(self.output_tokens * 0.75)))
+
+    def generate_content(self, contents, stream: bool = False, **kwargs):
+        contents = contents if isinstance(contents, list) else [contents]
+        texts = [_content_text(c) for c in contents]
+        self.recorder.record("validator" if self.is_validator else "wellness",
+                             sum(len(t.encode("utf-8")) for t in texts), len(texts))
+        reply = self._reply(texts[-1] if texts else "")
+        duration = self.latency + self.output_tokens * self.per_token_latency
+        if not stream:
+            time.sleep(duration)
+            return FakeResponse(reply)
+        return self._stream(reply, duration)
+
+    def _stream(self, reply: str, duration: float):
+        time.sleep(self.latency)
+        step = max(1, len(reply) // self.stream_chunks)
+        pause = (duration - self.latency) / self.stream_chunks
+        for i in range(0, len(reply), step):
+            time.sleep(pause)
+            yield FakeResponse(reply[i:i + step])
+
+
+class CallRecorder:
+    """Thread-safe log of prompt sizes sent to the fake models"""
+
+    def __init__(self):
+        self.calls: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def record(self, agent: str, prompt_bytes: int, messages: int):
+        with self._lock:
+            self.calls.append({"agent": agent, "prompt_bytes": prompt_bytes, "messages": messages})
+
+    def drain(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            calls, self.calls = self.calls, []
+            return calls
+
+
+class FakeModelFactory:
+    """Drop-in for model_factory.ModelFactory that hands out fake models"""
+
+    def __init__(self, **model_kwargs):
+        self.recorder = CallRecorder()
+        self.model_kwargs = model_kwargs
+        self._models = {}
+
+    def get(self, system_instruction: str = None, model_name: str = None):
+        key = system_instruction or ""
+        if key not in self._models:
+            self._models[key] = FakeGenerativeModel(system_instruction=system_instruction,
+                                                    recorder=self.recorder, **self.model_kwargs)
+        return self._models[key]
+
+
+class SerperStandIn:
+    """Local HTTP server that answers every Serper search with recorded JSON"""
+
+    def __init__(self, fixture_path: str = FIXTURE_PATH, latency: float = 0.08):
+        with open(fixture_path, "r") as f:
+            fixture = json.load(f)
+        self.latency = latency
+        self.requests = 0
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                stand_in.requests += 1
+                time.sleep(stand_in.latency)
+                payload = dict(fixture)
+                payload["searchParameters"] = {**fixture.get("searchParameters", {}), "q": body.get("q", "")}
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}/search"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,241 @@
+"""Benchmark the wellness coach against local Gemini/Serper stand-ins.
+
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --output new.json --compare bench.json
+
+Reports p50/p95/p99 latency per stage, prompt bytes per turn and memory per
+session, and writes everything as JSON so runs can be compared between commits.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from typing import Dict, Any, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import PersonalWellnessCoach  # noqa: E402
+from instrumentation import Instrumentation  # noqa: E402
+from search_cache import MemorySearchCache  # noqa: E402
+from search_client import SerperClient  # noqa: E402
+from benchmarks.fakes import FakeModelFactory, SerperStandIn  # noqa: E402
+
+# Mix of plain coaching, search-triggering and invalid turns
+SCRIPTED_TURNS = [
+    "Hi! I want to sleep better and have more energy during the day.",
+    "What are the latest studies on intermittent fasting?",
+    "How many glasses of water should I drink each day?",
+    "Can you give me a 20 minute morning workout?",
+    "What are the benefits of green tea?",
+    "I've been feeling stressed at work, any breathing exercises?",
+    "Tell me about bitcoin prices",
+    "Is it healthy to eat eggs every day?",
+    "How do I build a habit of evening walks?",
+    "Recent research on creatine and muscle recovery",
+]
+
+SEARCH_QUERIES = ["green tea benefits", "sleep hygiene", "Green Tea  Benefits", "protein intake",
+                  "benefits green tea", "hiit vs steady cardio", "sleep hygiene", "magnesium and sleep"]
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Nearest-rank p50/p95/p99 (in milliseconds)"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def rank(p):
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered) + 0.5)) - 1))]
+
+    return {
+        "count": len(ordered),
+        "p50_ms": round(rank(50) * 1000, 3),
+        "p95_ms": round(rank(95) * 1000, 3),
+        "p99_ms": round(rank(99) * 1000, 3),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3)
+    }
+
+
+def build_coach(factory: FakeModelFactory, client: SerperClient, history_days: int = 0,
+                goals: int = 0, exchanges: int = 0) -> PersonalWellnessCoach:
+    """A coach with a realistic amount of existing history"""
+    coach = PersonalWellnessCoach("benchmark-key", "benchmark-key", search_cache=MemorySearchCache(),
+                                  search_client=client, model_factory=factory)
+    coach.update_user_profile({"age": "34", "activity_level": "lightly active",
+                               "primary_goal": "improve sleep", "dietary_preferences": "vegetarian"})
+    for i in range(goals):
+        coach.add_wellness_goal(f"Goal {i}: walk {5000 + i * 100} steps daily", category="fitness")
+    today = date.today()
+    for d in range(history_days):
+        day = (today - timedelta(days=history_days - d - 1)).isoformat()
+        coach.track_daily_metric("steps", 6000 + (d * 37) % 4000, day)
+        coach.track_daily_metric("sleep hours", 6 + (d % 5) * 0.5, day)
+        coach.track_daily_metric("water", f"{6 + d % 4} glasses", day)
+    for i in range(exchanges):
+        coach._add_to_memory(f"Earlier question {i} about sleep and energy", "Earlier coaching reply " * 20)
+    return coach
+
+
+def timed(samples: List[float], func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    samples.append(time.perf_counter() - start)
+    return result
+
+
+def bench_chat(factory, client, turns: int, history_days: int) -> Dict[str, Any]:
+    coach = build_coach(factory, client, history_days=history_days, goals=20, exchanges=20)
+    coach.instrumentation = Instrumentation()  # only this run's turns in the stage breakdown
+    factory.recorder.drain()
+    chat_samples, stream_total, ttft = [], [], []
+    wellness_bytes = []
+
+    for i in range(turns):
+        message = SCRIPTED_TURNS[i % len(SCRIPTED_TURNS)]
+        timed(chat_samples, coach.chat, message)
+        wellness_bytes.extend(c["prompt_bytes"] for c in factory.recorder.drain() if c["agent"] == "wellness")
+
+        list(coach.chat_stream(message))
+        if coach.last_turn_timing.get("streamed"):
+            stream_total.append(coach.last_turn_timing["total"])
+            ttft.append(coach.last_turn_timing["ttft"])
+        factory.recorder.drain()
+
+    return {
+        "chat": percentiles(chat_samples),
+        "chat_stream_total": percentiles(stream_total),
+        "chat_stream_ttft": percentiles(ttft),
+        "prompt_bytes_per_turn": {
+            "mean": round(sum(wellness_bytes) / len(wellness_bytes)) if wellness_bytes else 0,
+            "max": max(wellness_bytes, default=0),
+            "last": wellness_bytes[-1] if wellness_bytes else 0
+        },
+        "validator": coach.validator.stats(),
+        "stages": coach.instrumentation.summary()["stages"]
+    }
+
+
+def bench_search(factory, client, rounds: int) -> Dict[str, Any]:
+    coach = build_coach(factory, client)
+    samples = []
+    for i in range(rounds):
+        timed(samples, coach.manual_search, SEARCH_QUERIES[i % len(SEARCH_QUERIES)])
+    return {"manual_search": percentiles(samples), "search_cache": coach.search_cache.stats()}
+
+
+def bench_tracking(factory, client, history_days: int, writes: int) -> Dict[str, Any]:
+    coach = build_coach(factory, client, history_days=history_days)
+    samples = []
+    for i in range(writes):
+        timed(samples, coach.track_daily_metric, "mood", f"{i % 10}/10")
+    summary = []
+    for _ in range(writes):
+        timed(summary, coach.get_progress_summary)
+    return {"track_daily_metric": percentiles(samples), "get_progress_summary": percentiles(summary)}
+
+
+def bench_session_io(factory, client, history_days: int, rounds: int) -> Dict[str, Any]:
+    coach = build_coach(factory, client, history_days=history_days, goals=100, exchanges=20)
+    save, load = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "session.json")
+        for _ in range(rounds):
+            timed(save, coach.save_session, path)
+            timed(load, coach.load_session, path)
+        size = os.path.getsize(path)
+    return {"save_session": percentiles(save), "load_session": percentiles(load), "session_file_bytes": size}
+
+
+def bench_memory(factory, client, sessions: int, history_days: int) -> Dict[str, Any]:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    coaches = [build_coach(factory, client, history_days=history_days, goals=10, exchanges=20) for _ in range(sessions)]
+    for coach in coaches:
+        coach.wellness_chat, coach.validator_chat  # materialize the lazy chat agents
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    used = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    # tracemalloc does not see SQLite's allocations, so the session's own per-component report is kept too
+    return {"sessions": sessions, "bytes_per_session": used // max(sessions, 1),
+            "session_components": coaches[0].memory_usage() if coaches else {}}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], path: str = "") -> List[str]:
+    """Lines describing how every p50/p95/p99 and byte metric moved against a baseline"""
+    lines = []
+    for key, value in current.items():
+        if key in ("meta",):
+            continue
+        base = baseline.get(key) if isinstance(baseline, dict) else None
+        name = f"{path}.{key}" if path else key
+        if isinstance(value, dict):
+            lines.extend(compare(value, base or {}, name))
+        elif isinstance(value, (int, float)) and isinstance(base, (int, float)) and base and \
+                (key.endswith("_ms") or "bytes" in key or key in ("mean", "max", "last")):
+            change = (value - base) / base * 100
+            lines.append(f"{name:60s} {base:>12} -> {value:>12} ({change:+.1f}%)")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--history-days", type=int, default=365)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--model-latency", type=float, default=0.05)
+    parser.add_argument("--search-latency", type=float, default=0.08)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    factory = FakeModelFactory(latency=args.model_latency)
+    with SerperStandIn(latency=args.search_latency) as serper:
+        client = SerperClient("benchmark-key", serper.url)
+        results = {
+            "meta": {
+                "revision": git_revision(),
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "python": platform.python_version(),
+                "args": vars(args)
+            },
+            "chat": bench_chat(factory, client, args.turns, args.history_days),
+            "search": bench_search(factory, client, args.turns),
+            "tracking": bench_tracking(factory, client, args.history_days, args.turns * 10),
+            "session_io": bench_session_io(factory, client, args.history_days, max(5, args.turns // 3)),
+            "memory": bench_memory(factory, client, args.sessions, args.history_days // 4),
+            "serper_requests": serper.requests
+        }
+        client.close()
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.compare} ({baseline.get('meta', {}).get('revision', '?')}):")
+        for line in compare(results, baseline):
+            print("  " + line)
+
+
+if __name__ == "__main__":
+    main()
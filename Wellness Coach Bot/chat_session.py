@@ -0,0 +1,93 @@
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate (~4 characters per token for English text)"""
+    return len(text) // 4 + 1
+
+
+def _content_text(content: Any) -> str:
+    """Extract plain text from a dict or SDK Content object"""
+    parts = content.get("parts", []) if isinstance(content, dict) else getattr(content, "parts", [])
+    return "".join(p if isinstance(p, str) else getattr(p, "text", "") for p in parts)
+
+
+class RollingChatSession:
+    """Gemini chat wrapper that keeps a bounded window of real turns.
+
+    Turns that fall out of the window are folded into a compact running
+    summary whenever the window overflows or the token budget is exceeded, so
+    the history sent with every request stays roughly constant in size. Only
+    the plain (user, model) text pairs are kept between turns; the request
+    contents are assembled from preamble + summary + window when generating.
+    """
+
+    def __init__(self, model, max_turns: int = 6, token_budget: int = 4000, summary_chars: int = 1200):
+        self.model = model
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.summary_chars = summary_chars
+
+        self.preamble: List[Dict[str, Any]] = []
+        self.summary_lines: deque = deque()
+        self.turns: deque = deque()  # (user_text, model_text)
+        self.rebuilds = 0
+        self._token_count = 0
+        self._rebuild()
+
+    @property
+    def history(self) -> list:
+        contents = list(self.preamble)
+        if self.summary_lines:
+            contents.append({"role": "user", "parts": ["Summary of our earlier conversation:\n" + "\n".join(self.summary_lines)]})
+            contents.append({"role": "model", "parts": ["Noted, I'll keep that in mind."]})
+        for user_text, model_text in self.turns:
+            contents.append({"role": "user", "parts": [user_text]})
+            contents.append({"role": "model", "parts": [model_text]})
+        return contents
+
+    @property
+    def token_count(self) -> int:
+        """Estimated tokens of history currently sent with every request"""
+        return self._token_count
+
+    def generate(self, prompt: str, stream: bool = False):
+        """Generate a reply to prompt on top of the current history, without recording it"""
+        contents = self.history
+        contents.append({"role": "user", "parts": [prompt]})
+        return self.model.generate_content(contents, stream=stream)
+
+    def commit(self, user_text: str, model_text: str):
+        """Record a finished turn. Only user_text (not the full context prompt) enters the window."""
+        self.turns.append((user_text, model_text))
+        self._token_count += estimate_tokens(user_text) + estimate_tokens(model_text)
+
+        if len(self.turns) > self.max_turns or self._token_count > self.token_budget:
+            self._fold()
+
+    def send_message(self, prompt: str, record: Optional[str] = None):
+        """Generate and commit in one step; record replaces prompt in the stored history"""
+        response = self.generate(prompt)
+        self.commit(record if record is not None else prompt, response.text)
+        return response
+
+    def reset(self):
+        """Drop all turns and the summary, keeping the preamble"""
+        self.turns.clear()
+        self.summary_lines.clear()
+        self._rebuild()
+
+    def _fold(self):
+        """Fold the oldest turns into the summary until within window and budget, then rebuild"""
+        while self.turns and (len(self.turns) > self.max_turns or self._token_count > self.token_budget):
+            user_text, model_text = self.turns.popleft()
+            self._token_count -= estimate_tokens(user_text) + estimate_tokens(model_text)
+            self.summary_lines.append(f"- User: {user_text[:160]} | Coach: {model_text[:160]}")
+            while sum(len(line) for line in self.summary_lines) > self.summary_chars:
+                self.summary_lines.popleft()
+        self._rebuild()
+
+    def _rebuild(self):
+        self._token_count = sum(estimate_tokens(_content_text(c)) for c in self.history)
+        self.rebuilds += 1
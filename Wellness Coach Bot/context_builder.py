@@ -0,0 +1,92 @@
+import json
+import os
+from typing import Callable, Dict, Any, Hashable, List, Optional, Tuple
+
+from chat_session import estimate_tokens
+
+# Token budget for the per-turn context prompt (the rolling chat history is budgeted separately)
+DEFAULT_PROMPT_TOKENS = int(os.getenv("WELLNESS_PROMPT_TOKENS", "2000"))
+
+
+def compact_json(value: Any) -> str:
+    """JSON without indentation or spaces, and with empty fields left out"""
+    return json.dumps(_strip_empty(value), separators=(",", ":"), ensure_ascii=False)
+
+
+def _strip_empty(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _strip_empty(v) for k, v in value.items() if v is not None and v != "" and v != [] and v != {}}
+    if isinstance(value, list):
+        return [_strip_empty(v) for v in value]
+    return value
+
+
+def truncate(text: str, limit: int) -> str:
+    """Cut text to at most `limit` characters at a word boundary"""
+    if len(text) <= limit:
+        return text
+    cut = text[:limit].rsplit(" ", 1)[0]
+    return cut.rstrip(" ,.;:") + "…"
+
+
+class ContextBuilder:
+    """Builds the per-turn context prompt from cached sections under a token budget.
+
+    Each section is rendered through section(name, key, render): the text is
+    reused as long as the caller's key (usually a version counter of the
+    underlying data) is unchanged, so a turn only re-serializes what changed
+    since the last one. build() joins the sections and, while the estimate is
+    over budget, applies the caller's reducers in order; each reducer returns
+    a smaller replacement for one section ("" drops it). The bytes and tokens
+    of every section in the last prompt are kept in `last_report`, and the
+    sections that had to be shrunk in `last_reduced`.
+    """
+
+    def __init__(self, budget_tokens: int = DEFAULT_PROMPT_TOKENS):
+        self.budget_tokens = budget_tokens
+        self._cache: Dict[str, Tuple[Hashable, str]] = {}
+        self.last_report: Dict[str, Dict[str, int]] = {}
+        self.last_reduced: List[str] = []
+        self.hits = 0
+        self.misses = 0
+
+    def section(self, name: str, key: Hashable, render: Callable[[], str]) -> str:
+        cached = self._cache.get(name)
+        if cached is not None and cached[0] == key:
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        text = render()
+        self._cache[name] = (key, text)
+        return text
+
+    def build(self, sections: List[Tuple[str, str]],
+              reducers: List[Tuple[str, Callable[[], str]]] = ()) -> str:
+        """Join (name, text) sections, shrinking them with reducers until the prompt fits the budget"""
+        texts = dict(sections)
+        tokens = {name: estimate_tokens(text) if text else 0 for name, text in texts.items()}
+        reduced = []
+        for name, reduce in reducers:
+            if sum(tokens.values()) <= self.budget_tokens:
+                break
+            if name not in texts or not texts[name]:
+                continue
+            texts[name] = reduce()
+            tokens[name] = estimate_tokens(texts[name]) if texts[name] else 0
+            reduced.append(name)
+
+        prompt = "\n\n".join(texts[name] for name, _ in sections if texts[name])
+        self.last_report = {name: {"bytes": len(texts[name].encode("utf-8")), "tokens": tokens[name]}
+                            for name, _ in sections if texts[name]}
+        self.last_reduced = reduced
+        return prompt
+
+    def invalidate(self, name: Optional[str] = None):
+        if name is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(name, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"budget_tokens": self.budget_tokens, "section_hits": self.hits, "section_misses": self.misses,
+                "last_prompt": self.last_report, "last_reduced": self.last_reduced}
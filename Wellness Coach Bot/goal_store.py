@@ -0,0 +1,307 @@
+import heapq
+from datetime import date, datetime
+from typing import Dict, Any, Iterator, List, Optional
+
+from intent_router import tokenize
+from metrics_store import first_number, parse_metric_value
+from session_records import intern_label
+
+GOAL_STATUSES = ("active", "completed", "abandoned")
+
+# Words that say which way a linked metric has to move ("get my weight down to 70", "walk at least 8000 steps")
+_DECREASE_WORDS = {"lose", "lower", "reduce", "cut", "drop", "down", "decrease", "under", "below", "less", "fewer",
+                   "max", "maximum", "limit"}
+_INCREASE_WORDS = {"increase", "gain", "raise", "boost", "up", "more", "least", "reach", "build", "min", "minimum"}
+
+# Target dates are free text from the user; these are the forms we understand
+_DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%m/%d/%Y", "%d.%m.%Y", "%B %d, %Y", "%B %d %Y", "%d %B %Y", "%b %d, %Y", "%b %d %Y")
+
+
+def parse_target_date(value: Any) -> Optional[int]:
+    """Day ordinal of a target date such as "2024-06-01" or "June 1, 2024", or None"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value.date().toordinal()
+    if isinstance(value, date):
+        return value.toordinal()
+    text = str(value).strip()
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date().toordinal()
+        except ValueError:
+            continue
+    return None
+
+
+def infer_metric_link(goal: str, metrics: List[str]) -> tuple:
+    """(metric, target value) for a goal like "walk 10,000 steps a day" when "steps" is tracked"""
+    target = first_number(goal)
+    if target is None or target <= 0:
+        return None, None
+    text = f" {' '.join(goal.lower().split())} "
+    for metric in sorted(metrics, key=len, reverse=True):
+        if f" {metric.lower()} " in text:
+            return metric, target
+    return None, None
+
+
+def infer_direction(goal: str, target: float, baseline: float = None) -> Optional[str]:
+    """"increase" or "decrease" for a metric-linked goal, or None when it cannot be told.
+
+    Explicit wording wins; otherwise the current value (baseline) is compared with the target.
+    """
+    words = set(tokenize(goal))
+    decrease, increase = bool(words & _DECREASE_WORDS), bool(words & _INCREASE_WORDS)
+    if decrease != increase:
+        return "decrease" if decrease else "increase"
+    if baseline is None or target is None or baseline == target:
+        return None
+    return "increase" if baseline < target else "decrease"
+
+
+class Goal:
+    """One wellness goal; to_dict() gives the session-file shape"""
+
+    __slots__ = ("id", "goal", "category", "created_date", "target_date", "status", "progress",
+                 "metric", "target_value", "direction", "baseline", "deadline")
+
+    def __init__(self, id: int, goal: str, category: str = "general", created_date: str = None,
+                 target_date: str = None, status: str = "active", progress: float = 0,
+                 metric: str = None, target_value: float = None, direction: str = None, baseline: float = None):
+        self.id = id
+        self.goal = goal
+        self.category = intern_label(category)
+        self.created_date = created_date or date.today().isoformat()
+        self.target_date = target_date
+        self.status = intern_label(status)
+        self.progress = progress
+        self.metric = metric
+        self.target_value = target_value
+        self.direction = direction  # "increase" or "decrease"; metric progress is only computed when known
+        self.baseline = baseline  # metric value when the goal was set (decrease goals measure from it)
+        self.deadline = parse_target_date(target_date)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "id": self.id,
+            "goal": self.goal,
+            "category": self.category,
+            "created_date": self.created_date,
+            "target_date": self.target_date,
+            "status": self.status,
+            "progress": self.progress
+        }
+        if self.metric:
+            data["metric"] = self.metric
+            data["target_value"] = self.target_value
+            data["direction"] = self.direction
+            data["baseline"] = self.baseline
+        return data
+
+    def metric_progress(self, value: float) -> Optional[float]:
+        """Percent done given the latest metric value, or None when direction or target is unknown"""
+        if self.target_value is None or self.direction not in ("increase", "decrease"):
+            return None
+        if self.direction == "increase":
+            return value / self.target_value * 100 if self.target_value > 0 else None
+        if self.baseline is None or self.baseline <= self.target_value:
+            return 100.0 if value <= self.target_value else 0.0
+        return (self.baseline - value) / (self.baseline - self.target_value) * 100
+
+
+class GoalStore:
+    """Wellness goals indexed by status, category and linked metric.
+
+    Status counts are read straight from the index sizes, so the progress
+    summary costs O(1) however many historical goals a user has. Active goals
+    with a parseable target date sit in a min-heap of (deadline, id); due() and
+    overdue() walk only the part of the heap inside the requested window.
+    Entries for goals that were completed or re-dated are skipped lazily and
+    swept out when they outnumber the live ones.
+    """
+
+    def __init__(self):
+        self._goals: Dict[int, Goal] = {}
+        self._by_status: Dict[str, set] = {}
+        self._by_category: Dict[str, set] = {}
+        self._by_metric: Dict[str, set] = {}
+        self._deadlines: List[tuple] = []
+        self._next_id = 1
+        self.version = 0  # bumped on every change, so callers can cache what they derive
+
+    def add(self, goal: str, category: str = "general", target_date: str = None, status: str = "active",
+            progress: float = 0, created_date: str = None, metric: str = None,
+            target_value: float = None, id: int = None, direction: str = None, baseline: float = None) -> Goal:
+        if id is None or id in self._goals:
+            id = self._next_id
+        self._next_id = max(self._next_id, id + 1)
+        record = Goal(id, goal, category, created_date, target_date, status, progress, metric, target_value,
+                      direction, baseline)
+        self._goals[id] = record
+        self._by_status.setdefault(record.status, set()).add(id)
+        self._by_category.setdefault(record.category, set()).add(id)
+        if metric:
+            self._by_metric.setdefault(metric, set()).add(id)
+        self._push_deadline(record)
+        self.version += 1
+        return record
+
+    def add_dict(self, data: Dict[str, Any]) -> Goal:
+        """Add a goal from its session-file dict (older files have no id, metric link or direction)"""
+        return self.add(data.get("goal", ""), data.get("category", "general"), data.get("target_date"),
+                        data.get("status", "active"), data.get("progress", 0), data.get("created_date"),
+                        data.get("metric"), data.get("target_value"), data.get("id"),
+                        data.get("direction"), data.get("baseline"))
+
+    def get(self, goal_id: int) -> Optional[Goal]:
+        return self._goals.get(goal_id)
+
+    def set_status(self, goal_id: int, status: str) -> Goal:
+        if status not in GOAL_STATUSES:
+            raise ValueError(f"Unknown goal status {status!r}; expected one of {', '.join(GOAL_STATUSES)}")
+        record = self._goals[goal_id]
+        status = intern_label(status)
+        if status != record.status:
+            self._by_status[record.status].discard(goal_id)
+            self._by_status.setdefault(status, set()).add(goal_id)
+            record.status = status
+            if status == "completed":
+                record.progress = 100
+            self._push_deadline(record)
+            self.version += 1
+        return record
+
+    def set_target_date(self, goal_id: int, target_date: str) -> Goal:
+        record = self._goals[goal_id]
+        record.target_date = target_date
+        record.deadline = parse_target_date(target_date)
+        self._push_deadline(record)
+        self.version += 1
+        return record
+
+    def set_progress(self, goal_id: int, progress: float) -> Goal:
+        record = self._goals[goal_id]
+        record.progress = max(0, min(100, round(progress)))
+        self.version += 1
+        return record
+
+    def on_metric(self, metric: str, value: Any) -> List[Goal]:
+        """Update progress of active goals linked to a metric from a newly tracked value"""
+        number = parse_metric_value(value)
+        if number is None:
+            return []
+        updated = []
+        for goal_id in self._by_metric.get(metric, ()):
+            record = self._goals[goal_id]
+            if record.status != "active":
+                continue
+            if record.direction == "decrease" and record.baseline is None:
+                record.baseline = number  # first value logged after the goal was set is where it starts
+            progress = record.metric_progress(number)
+            if progress is not None:
+                self.set_progress(goal_id, progress)
+                updated.append(record)
+        return updated
+
+    def _push_deadline(self, record: Goal):
+        if record.status == "active" and record.deadline is not None:
+            heapq.heappush(self._deadlines, (record.deadline, record.id))
+            if len(self._deadlines) > 2 * max(16, self.count("active")):
+                self._compact()
+
+    def _live(self, entry: tuple) -> bool:
+        record = self._goals.get(entry[1])
+        return record is not None and record.status == "active" and record.deadline == entry[0]
+
+    def _compact(self):
+        self._deadlines = [entry for entry in self._deadlines if self._live(entry)]
+        heapq.heapify(self._deadlines)
+
+    def _until(self, last_day: int) -> Iterator[Goal]:
+        """Active goals with a deadline on or before last_day, soonest first.
+
+        Walks the heap as a tree with a frontier heap of indexes, so only the
+        entries inside the window (and their direct children) are visited.
+        """
+        heap = self._deadlines
+        frontier = [(heap[0], 0)] if heap else []
+        seen = set()  # a goal re-activated with the same date has two live entries
+        while frontier:
+            entry, i = heapq.heappop(frontier)
+            if entry[0] > last_day:
+                continue  # children are never earlier than their parent
+            if self._live(entry) and entry[1] not in seen:
+                seen.add(entry[1])
+                yield self._goals[entry[1]]
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+
+    def overdue(self, today: Any = None) -> List[Goal]:
+        """Active goals whose target date has passed"""
+        return list(self._until(_today(today) - 1))
+
+    def due(self, within_days: int = 7, today: Any = None) -> List[Goal]:
+        """Active goals due between today and within_days from now"""
+        start = _today(today)
+        return [g for g in self._until(start + within_days) if g.deadline >= start]
+
+    def next_deadline(self) -> Optional[Goal]:
+        """The active goal with the earliest target date"""
+        while self._deadlines and not self._live(self._deadlines[0]):
+            heapq.heappop(self._deadlines)
+        return self._goals[self._deadlines[0][1]] if self._deadlines else None
+
+    def reminders(self, within_days: int = 7, today: Any = None, limit: int = None) -> List[str]:
+        """Short reminder lines for overdue and soon-due goals, most overdue first"""
+        start = _today(today)
+        lines = []
+        for record in self._until(start + within_days):
+            if limit is not None and len(lines) >= limit:
+                break
+            days = record.deadline - start
+            if days < 0:
+                lines.append(f"{record.goal} was due {record.target_date} ({-days} days ago)")
+            elif days == 0:
+                lines.append(f"{record.goal} is due today")
+            else:
+                lines.append(f"{record.goal} is due {record.target_date} (in {days} days)")
+        return lines
+
+    def count(self, status: str) -> int:
+        return len(self._by_status.get(status, ()))
+
+    def by_status(self, status: str) -> List[Goal]:
+        return sorted((self._goals[i] for i in self._by_status.get(status, ())), key=lambda g: g.id)
+
+    def by_category(self, category: str) -> List[Goal]:
+        return sorted((self._goals[i] for i in self._by_category.get(category, ())), key=lambda g: g.id)
+
+    def counts(self) -> Dict[str, int]:
+        return {status: len(ids) for status, ids in self._by_status.items() if ids}
+
+    def category_counts(self) -> Dict[str, int]:
+        return {category: len(ids) for category, ids in self._by_category.items() if ids}
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return [record.to_dict() for record in self._goals.values()]
+
+    @classmethod
+    def from_list(cls, goals: List[Dict[str, Any]]) -> "GoalStore":
+        store = cls()
+        for data in goals:
+            store.add_dict(data)
+        return store
+
+    def __iter__(self) -> Iterator[Goal]:
+        return iter(list(self._goals.values()))
+
+    def __len__(self):
+        return len(self._goals)
+
+
+def _today(today: Any) -> int:
+    if today is None:
+        return date.today().toordinal()
+    return today if isinstance(today, int) else parse_target_date(today)
@@ -0,0 +1,280 @@
+import cProfile
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Any, List, Optional
+
+# Latency buckets (seconds) shared by the histogram and the Prometheus export
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_turn_ids = itertools.count(1)
+
+
+class Stage:
+    """One timed stage of a turn; attributes can be added while it runs"""
+
+    __slots__ = ("name", "start", "duration", "attrs")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.name = name
+        self.start = time.perf_counter()
+        self.duration = None
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"ms": round((self.duration or 0.0) * 1000, 3), **self.attrs}
+
+
+class _StageContext:
+    def __init__(self, trace: "TurnTrace", name: str, attrs: Dict[str, Any]):
+        self.trace = trace
+        self.stage = Stage(name, attrs)
+
+    def __enter__(self) -> Stage:
+        return self.stage
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stage.duration = time.perf_counter() - self.stage.start
+        if exc_type is not None:
+            self.stage.attrs["error"] = exc_type.__name__
+        self.trace._add(self.stage)
+        return False
+
+
+class TurnTrace:
+    """Structured record of one chat turn. Stages may overlap and run on different threads."""
+
+    def __init__(self, instrumentation: "Instrumentation", labels: Dict[str, Any]):
+        self.instrumentation = instrumentation
+        self.turn_id = next(_turn_ids)
+        self.labels = labels
+        self.start = time.perf_counter()
+        self.stages: List[Stage] = []
+        self.attrs: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._profiler: Optional[cProfile.Profile] = None
+
+    def stage(self, name: str, **attrs) -> _StageContext:
+        return _StageContext(self, name, attrs)
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def _add(self, stage: Stage):
+        with self._lock:
+            self.stages.append(stage)
+
+    def __enter__(self) -> "TurnTrace":
+        self._profiler = self.instrumentation._maybe_profiler()
+        if self._profiler is not None:
+            try:
+                self._profiler.enable()
+            except ValueError:
+                self._profiler = None  # another turn on this thread is already being profiled
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        total = time.perf_counter() - self.start
+        if self._profiler is not None:
+            self._profiler.disable()
+            self.instrumentation._save_profile(self.turn_id, self._profiler)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.instrumentation._emit(self, total)
+        return False
+
+    def to_dict(self, total: float) -> Dict[str, Any]:
+        return {
+            "turn_id": self.turn_id,
+            "timestamp": time.time(),
+            **self.labels,
+            **self.attrs,
+            "total_ms": round(total * 1000, 3),
+            "stages": {s.name: s.to_dict() for s in self.stages}
+        }
+
+
+class HistogramSink:
+    """In-memory per-stage latency histograms, with a bounded reservoir for percentiles"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, reservoir: int = 2048):
+        self.buckets = tuple(buckets)
+        self.reservoir = reservoir
+        self._stages: Dict[str, Dict[str, Any]] = {}
+        self._counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _observe(self, name: str, seconds: float):
+        hist = self._stages.get(name)
+        if hist is None:
+            hist = {"counts": [0] * len(self.buckets), "count": 0, "sum": 0.0, "recent": deque(maxlen=self.reservoir)}
+            self._stages[name] = hist
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                hist["counts"][i] += 1
+        hist["count"] += 1
+        hist["sum"] += seconds
+        hist["recent"].append(seconds)
+
+    def _count(self, name: str, value: float = 1):
+        self._counters[name] = self._counters.get(name, 0) + value
+
+    def record(self, turn: Dict[str, Any]):
+        with self._lock:
+            self._observe("turn", turn["total_ms"] / 1000)
+            for name, stage in turn["stages"].items():
+                self._observe(name, stage["ms"] / 1000)
+                if "cache_hit" in stage:
+                    self._count(f"search_cache_{'hits' if stage['cache_hit'] else 'misses'}")
+                if stage.get("coalesced"):
+                    self._count("search_coalesced")
+                if stage.get("stale"):
+                    self._count("search_stale")
+                if "sub_queries" in stage:
+                    self._count("search_sub_queries", stage["sub_queries"])
+                if "answer_hit" in stage:
+                    self._count(f"answer_cache_{'hits' if stage['answer_hit'] else 'misses'}")
+                if "tier" in stage:
+                    self._count(f"validation_{stage['tier']}")
+                if "prompt_bytes" in stage:
+                    self._count("prompt_bytes", stage["prompt_bytes"])
+                    self._count("prompt_tokens", stage.get("prompt_tokens", 0))
+                for section, size in stage.get("sections", {}).items():
+                    self._count(f"prompt_{section}_tokens", size["tokens"])
+                if stage.get("reduced"):
+                    self._count("prompt_over_budget")
+                if "ttft_ms" in stage:
+                    self._observe("generation_ttft", stage["ttft_ms"] / 1000)
+                if "error" in stage:
+                    self._count(f"errors_{name}")
+            self._count("turns")
+
+    def summary(self) -> Dict[str, Any]:
+        """p50/p95/p99 (ms) per stage from the recent reservoir, plus counters"""
+        with self._lock:
+            out = {}
+            for name, hist in self._stages.items():
+                ordered = sorted(hist["recent"])
+                if not ordered:
+                    continue
+                pick = lambda p: round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 3)
+                out[name] = {"count": hist["count"], "p50_ms": pick(0.50), "p95_ms": pick(0.95), "p99_ms": pick(0.99)}
+            return {"stages": out, "counters": dict(self._counters)}
+
+    def to_prometheus(self, prefix: str = "wellness") -> str:
+        """Prometheus text exposition format"""
+        with self._lock:
+            lines = [f"# HELP {prefix}_stage_duration_seconds Chat turn stage latency",
+                     f"# TYPE {prefix}_stage_duration_seconds histogram"]
+            for name, hist in sorted(self._stages.items()):
+                for bound, count in zip(self.buckets, hist["counts"]):
+                    lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{name}",le="{bound}"}} {count}')
+                lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{name}",le="+Inf"}} {hist["count"]}')
+                lines.append(f'{prefix}_stage_duration_seconds_sum{{stage="{name}"}} {hist["sum"]:.6f}')
+                lines.append(f'{prefix}_stage_duration_seconds_count{{stage="{name}"}} {hist["count"]}')
+            for name, value in sorted(self._counters.items()):
+                lines.append(f"# TYPE {prefix}_{name}_total counter")
+                lines.append(f"{prefix}_{name}_total {value}")
+            return "\n".join(lines) + "\n"
+
+
+class JsonLinesSink:
+    """Appends one JSON object per turn to a log file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._fh = open(path, "a")
+
+    def record(self, turn: Dict[str, Any]):
+        line = json.dumps(turn, separators=(",", ":"))
+        with self._lock:
+            self._fh.write(line + "\n")
+            self._fh.flush()
+
+    def close(self):
+        with self._lock:
+            self._fh.close()
+
+
+class Instrumentation:
+    """Per-stage latency/token tracing for chat turns with pluggable sinks.
+
+    A sink is anything with a record(turn_dict) method. A `profile_sample_rate`
+    fraction of turns also runs under cProfile and is dumped to `profile_dir`;
+    the profile covers the thread that drives the turn (the event loop for
+    achat), not the worker threads. `tracer` is called with every finished turn
+    for integration with external tracing systems.
+    """
+
+    def __init__(self, sinks: list = None, profile_sample_rate: float = 0.0, profile_dir: str = "profiles",
+                 tracer: Callable[[Dict[str, Any]], None] = None):
+        self.histogram = HistogramSink()
+        self.sinks = [self.histogram] + list(sinks or [])
+        self.profile_sample_rate = profile_sample_rate
+        self.profile_dir = profile_dir
+        self.tracer = tracer
+
+    def turn(self, **labels) -> TurnTrace:
+        return TurnTrace(self, labels)
+
+    def _maybe_profiler(self) -> Optional[cProfile.Profile]:
+        if self.profile_sample_rate > 0 and random.random() < self.profile_sample_rate:
+            return cProfile.Profile()
+        return None
+
+    def _save_profile(self, turn_id: int, profiler: cProfile.Profile):
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            profiler.dump_stats(os.path.join(self.profile_dir, f"turn_{os.getpid()}_{turn_id}.prof"))
+        except OSError as e:
+            print(f"Profile dump error: {e}")
+
+    def _emit(self, trace: TurnTrace, total: float):
+        turn = trace.to_dict(total)
+        for sink in self.sinks:
+            try:
+                sink.record(turn)
+            except Exception as e:
+                print(f"Instrumentation sink error: {e}")
+        if self.tracer is not None:
+            try:
+                self.tracer(turn)
+            except Exception as e:
+                print(f"Instrumentation tracer error: {e}")
+
+    def summary(self) -> Dict[str, Any]:
+        return self.histogram.summary()
+
+    def to_prometheus(self) -> str:
+        return self.histogram.to_prometheus()
+
+
+_DEFAULT_INSTRUMENTATION: Optional[Instrumentation] = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_default_instrumentation() -> Instrumentation:
+    """Process-wide instrumentation configured from WELLNESS_TRACE_LOG / WELLNESS_PROFILE_RATE"""
+    global _DEFAULT_INSTRUMENTATION
+    with _DEFAULT_LOCK:
+        if _DEFAULT_INSTRUMENTATION is None:
+            sinks = []
+            trace_log = os.getenv("WELLNESS_TRACE_LOG")
+            if trace_log:
+                sinks.append(JsonLinesSink(trace_log))
+            _DEFAULT_INSTRUMENTATION = Instrumentation(
+                sinks=sinks,
+                profile_sample_rate=float(os.getenv("WELLNESS_PROFILE_RATE", "0")),
+                profile_dir=os.getenv("WELLNESS_PROFILE_DIR", "profiles")
+            )
+        return _DEFAULT_INSTRUMENTATION
@@ -0,0 +1,218 @@
+import json
+import os
+import re
+import threading
+from itertools import product
+from typing import Dict, Any, List, Optional, Tuple
+
+DEFAULT_INTENTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intents.json")
+
+# Words, with numbers split off ("200mg" -> "200", "mg") so "# mg" style phrases match
+_TOKEN_RE = re.compile(r"\d+(?:\.\d+)?|[a-z]+(?:'[a-z]+)?")
+_PATTERN_TOKEN_RE = re.compile(r"#|\d+(?:\.\d+)?|[a-z]+(?:'[a-z]+)?")
+_GROUP_RE = re.compile(r"\(([^()]*)\)")
+
+NUMBER_TOKEN = "#"
+GREETING_MAX_WORDS = 12
+
+# Matches that make a word "known" for the local validator; any other word (outside the stopword and
+# filler lists) leaves the verdict to the LLM
+_KNOWN_TAGS = ("valid", "greeting", "personal", "search", "search_topical")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _match_token(token: str) -> str:
+    return NUMBER_TOKEN if token[0].isdigit() else token
+
+
+def expand_phrase(pattern: str) -> List[Tuple[str, ...]]:
+    """Expand "lose # (pounds|kg)" into token tuples for every alternative"""
+    pieces = _GROUP_RE.split(pattern)
+    # Odd indices are the contents of (a|b) groups
+    options = [piece.split("|") if i % 2 else [piece] for i, piece in enumerate(pieces)]
+    phrases = []
+    for combo in product(*options):
+        tokens = [_match_token(t) for t in _PATTERN_TOKEN_RE.findall("".join(combo).lower())]
+        if tokens:
+            phrases.append(tuple(tokens))
+    return phrases
+
+
+class PhraseMatcher:
+    """Word-level trie matcher: finds every (overlapping) phrase in one pass over the tokens.
+
+    Matching works on whole tokens, so "vs" never fires inside "canvas" and
+    "meth" never fires inside "method".
+    """
+
+    def __init__(self):
+        self._root: Dict[str, Any] = {}
+        self.max_len = 0
+
+    def add(self, pattern: str, tag: str):
+        for phrase in expand_phrase(pattern):
+            node = self._root
+            for token in phrase:
+                node = node.setdefault(token, {})
+            node.setdefault(None, []).append(tag)  # None key holds the tags ending here
+            self.max_len = max(self.max_len, len(phrase))
+
+    def find(self, tokens: List[str]) -> List[Tuple[str, int, int]]:
+        """All (tag, start, end) matches, in order of start position"""
+        keys = [_match_token(t) for t in tokens]
+        matches = []
+        for start in range(len(keys)):
+            node = self._root
+            for end in range(start, min(len(keys), start + self.max_len)):
+                node = node.get(keys[end])
+                if node is None:
+                    break
+                for tag in node.get(None, ()):
+                    matches.append((tag, start, end + 1))
+        return matches
+
+
+class Intent:
+    """Everything the coach needs to know about one input, decided in a single pass"""
+
+    __slots__ = ("text", "command", "argument", "needs_search", "search_topic", "validator_hint", "personal",
+                 "matches")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.command: Optional[str] = None
+        self.argument = ""
+        self.needs_search = False
+        self.search_topic = ""
+        # "invalid:<category>", "ambiguous", "valid", "off_topic", "greeting" or None (None and
+        # "ambiguous" both leave the verdict to the LLM validator)
+        self.validator_hint: Optional[str] = None
+        # Refers to the user's own history/tracking ("my", "this week"), so its answer is never reused
+        self.personal = False
+        self.matches: List[Tuple[str, int, int]] = []
+
+    def __repr__(self):
+        return (f"Intent(command={self.command!r}, needs_search={self.needs_search}, "
+                f"search_topic={self.search_topic!r}, validator_hint={self.validator_hint!r})")
+
+
+class IntentRouter:
+    """Compiled intent engine for CLI commands, search triggers, search topics and validator hints.
+
+    Patterns are loaded from intents.json; every phrase list is compiled into
+    one PhraseMatcher so routing an input is a single pass over its words.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.matcher = PhraseMatcher()
+
+        self.argument_commands = set()
+        for name, spec in config.get("commands", {}).items():
+            for phrase in spec["phrases"]:
+                self.matcher.add(phrase, f"cmd:{name}")
+            if spec.get("takes_argument"):
+                self.argument_commands.add(name)
+
+        # Framing triggers ("latest", "studies on") are dropped from the search topic;
+        # topical ones ("side effects", "calories in") carry meaning and are kept
+        triggers = config.get("search_triggers", {})
+        for phrase in triggers.get("framing", []):
+            self.matcher.add(phrase, "search")
+        for phrase in triggers.get("topical", []):
+            self.matcher.add(phrase, "search_topical")
+
+        validator = config.get("validator", {})
+        for phrase in validator.get("valid", []):
+            self.matcher.add(phrase, "valid")
+        for phrase in validator.get("greetings", []):
+            self.matcher.add(phrase, "greeting")
+        for category, spec in validator.get("invalid", {}).items():
+            for phrase in spec["phrases"]:
+                self.matcher.add(phrase, f"invalid:{category}")
+        for phrase in validator.get("off_topic", []):
+            self.matcher.add(phrase, "off_topic")
+        for phrase in validator.get("ambiguous", []):
+            self.matcher.add(phrase, "ambiguous")
+
+        for phrase in config.get("personal_references", []):
+            self.matcher.add(phrase, "personal")
+
+        self.stopwords = set(config.get("topic_stopwords", []))
+        self.filler = set(tokenize(" ".join(validator.get("filler", []))))
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_INTENTS_PATH) -> "IntentRouter":
+        with open(path, "r") as f:
+            return cls(json.load(f))
+
+    def route(self, text: str) -> Intent:
+        intent = Intent(text)
+        tokens = tokenize(text)
+        matches = self.matcher.find(tokens)
+        intent.matches = matches
+
+        # Command dispatch: the command word must open the input; only some commands take an argument
+        for tag, start, end in matches:
+            if start != 0 or not tag.startswith("cmd:"):
+                continue
+            name = tag[4:]
+            if end == len(tokens) or name in self.argument_commands:
+                intent.command = name
+                if name in self.argument_commands:
+                    intent.argument = re.sub(r"^\s*\S+\s*", "", text, count=1).strip()
+                return intent
+
+        tags = {tag for tag, _, _ in matches}
+        intent.personal = "personal" in tags
+
+        if "search" in tags or "search_topical" in tags:
+            intent.needs_search = True
+            covered = {i for tag, start, end in matches if tag == "search" for i in range(start, end)}
+            topic = [t for i, t in enumerate(tokens) if i not in covered and t not in self.stopwords]
+            intent.search_topic = " ".join(topic)
+
+        intent.validator_hint = self._validator_hint(tokens, matches, tags)
+        return intent
+
+    def _validator_hint(self, tokens: List[str], matches: List[Tuple[str, int, int]], tags: set) -> Optional[str]:
+        """Local validator hint. Only clear-cut inputs get "valid"/"greeting"; mixed signals go to the LLM."""
+        invalid = next((tag for tag, _, _ in matches if tag.startswith("invalid:")), None)
+        if invalid:
+            return invalid
+        if "ambiguous" in tags or ("valid" in tags and "off_topic" in tags):
+            return "ambiguous"
+
+        known = _KNOWN_TAGS + ("off_topic",)
+        covered = {i for tag, start, end in matches if tag in known for i in range(start, end)}
+        unknown = [t for i, t in enumerate(tokens)
+                   if i not in covered and t not in self.stopwords and t not in self.filler and not t[0].isdigit()]
+        # Any word we know nothing about could make it a wellness question ("eye strain from coding")
+        if unknown:
+            return None
+        if "off_topic" in tags:
+            return "off_topic"
+        if "valid" in tags:
+            return "valid"
+        if "greeting" in tags and len(tokens) <= GREETING_MAX_WORDS:
+            return "greeting"
+        return None
+
+    def invalid_redirect(self, category: str) -> Optional[str]:
+        return self.config.get("validator", {}).get("invalid", {}).get(category, {}).get("redirect")
+
+
+_DEFAULT_ROUTER: Optional[IntentRouter] = None
+_DEFAULT_ROUTER_LOCK = threading.Lock()
+
+
+def get_default_router() -> IntentRouter:
+    """Process-wide router compiled from WELLNESS_INTENTS (or the bundled intents.json)"""
+    global _DEFAULT_ROUTER
+    with _DEFAULT_ROUTER_LOCK:
+        if _DEFAULT_ROUTER is None:
+            _DEFAULT_ROUTER = IntentRouter.from_file(os.getenv("WELLNESS_INTENTS", DEFAULT_INTENTS_PATH))
+        return _DEFAULT_ROUTER
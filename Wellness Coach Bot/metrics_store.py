@@ -0,0 +1,323 @@
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+from typing import Dict, Any, List, Optional
+
+from session_records import intern_label
+
+_NUMBER_RE = re.compile(r"[-+]?\d*\.?\d+")
+# A whole logged value: one number, optionally followed by a unit made of words ("7.5 hours", "72 kg", "80 %")
+_VALUE_RE = re.compile(r"\s*([-+]?(?:\d+(?:\.\d*)?|\.\d+))\s*(%|[^\W\d_]+(?:\s+[^\W\d_]+)*)?\.?\s*")
+_THOUSANDS_RE = re.compile(r"(?<=\d),(?=\d{3}(?!\d))")
+
+
+def split_metric_value(value: Any) -> tuple[Optional[float], Optional[str]]:
+    """Parse a logged value such as "8", "7.5 hours" or "10,000 steps" to a number and its unit.
+
+    The unit is None for a bare number. Anything else ("120/80", "11pm-7am",
+    "great") parses to (None, None) and is stored as text.
+    """
+    if isinstance(value, bool):
+        return float(value), None
+    if isinstance(value, (int, float)):
+        return float(value), None
+    match = _VALUE_RE.fullmatch(_THOUSANDS_RE.sub("", str(value)))
+    if not match:
+        return None, None
+    unit = match.group(2)
+    return float(match.group(1)), " ".join(unit.lower().split()) if unit else None
+
+
+def parse_metric_value(value: Any) -> Optional[float]:
+    """The number in a logged value, or None when it is stored as text"""
+    return split_metric_value(value)[0]
+
+
+def first_number(text: str) -> Optional[float]:
+    """The first number anywhere in free text, such as 10000 in "walk 10,000 steps daily"."""
+    match = _NUMBER_RE.search(_THOUSANDS_RE.sub("", text))
+    return float(match.group()) if match else None
+
+
+def _to_ordinal(day: Any) -> int:
+    if isinstance(day, int):
+        return day
+    if isinstance(day, datetime):
+        return day.date().toordinal()
+    if isinstance(day, date):
+        return day.toordinal()
+    return date.fromisoformat(str(day)).toordinal()
+
+
+def _to_iso(ordinal: int) -> str:
+    return date.fromordinal(ordinal).isoformat()
+
+
+def _display(value: float) -> Any:
+    return int(value) if value.is_integer() else value
+
+
+def _with_unit(value: float, unit: Optional[str]) -> Any:
+    """A series value as logged: a bare number, or text such as "180 lbs" that parses back the same"""
+    if unit is None:
+        return _display(value)
+    return f"{_display(value)}{unit}" if unit == "%" else f"{_display(value)} {unit}"
+
+
+def _same_unit(a: str, b: str) -> bool:
+    """Whether two units name the same thing, ignoring plurals ("hour"/"hours", "lb"/"lbs")"""
+    def key(unit: str) -> List[str]:
+        return [w[:-1] if len(w) > 2 and w.endswith("s") else w for w in unit.split()]
+    return key(a) == key(b)
+
+
+class MetricSeries:
+    """One metric's values in two parallel arrays, kept sorted by day"""
+
+    __slots__ = ("days", "values", "_prefix")
+
+    def __init__(self):
+        self.days = array('l')
+        self.values = array('d')
+        self._prefix = None  # prefix sums, rebuilt lazily after writes
+
+    def upsert(self, day: int, value: float):
+        i = bisect_left(self.days, day)
+        if i < len(self.days) and self.days[i] == day:
+            self.values[i] = value
+        elif i == len(self.days):
+            self.days.append(day)
+            self.values.append(value)
+        else:
+            self.days.insert(i, day)
+            self.values.insert(i, value)
+        self._prefix = None
+
+    def remove(self, day: int) -> bool:
+        i = bisect_left(self.days, day)
+        if i == len(self.days) or self.days[i] != day:
+            return False
+        del self.days[i]
+        del self.values[i]
+        self._prefix = None
+        return True
+
+    def bounds(self, start: int, end: int) -> tuple[int, int]:
+        """Index range of days within [start, end]"""
+        return bisect_left(self.days, start), bisect_right(self.days, end)
+
+    def prefix_sums(self) -> array:
+        if self._prefix is None:
+            prefix = array('d', [0.0])
+            total = 0.0
+            for v in self.values:
+                total += v
+                prefix.append(total)
+            self._prefix = prefix
+        return self._prefix
+
+    def __len__(self):
+        return len(self.days)
+
+
+class MetricsStore:
+    """Typed, date-indexed store for daily wellness metrics.
+
+    Numeric values live in array-backed series per metric with a sorted day
+    index, so range queries and rolling aggregates cost O(log n + window)
+    instead of scanning the whole history. Each series keeps the unit it was
+    last logged in; a value in a different unit ("81 kg" after "180 lbs") is
+    kept as text rather than averaged with the rest.
+    """
+
+    def __init__(self):
+        self._series: Dict[str, MetricSeries] = {}
+        self._units: Dict[str, str] = {}  # unit of each numeric series, as last logged
+        self._text: Dict[str, Dict[int, str]] = {}  # non-numeric entries, e.g. mood "great"
+        self._days = array('l')  # every day with at least one entry, sorted
+        self.version = 0  # bumped on every write, so callers can cache what they derive
+
+    def record(self, metric: str, value: Any, day: Any = None) -> bool:
+        """Record a metric value for a day (defaults to today), replacing any earlier value.
+
+        Returns True when the value joined the metric's numeric series.
+        """
+        ordinal = _to_ordinal(day) if day is not None else date.today().toordinal()
+        number, unit = split_metric_value(value)
+        metric = intern_label(metric)  # the same few names (and moods) repeat across every session
+
+        current = self._units.get(metric)
+        if number is not None and unit is not None and current is not None and not _same_unit(unit, current):
+            number = None  # "81 kg" cannot be averaged with a series in lbs
+
+        if number is None:
+            self._text.setdefault(metric, {})[ordinal] = intern_label(value)
+            # Text replaces a number logged for the same day, as a number replaces text
+            series = self._series.get(metric)
+            if series is not None and series.remove(ordinal) and not series:
+                del self._series[metric]
+                self._units.pop(metric, None)
+        else:
+            self._series.setdefault(metric, MetricSeries()).upsert(ordinal, number)
+            if unit is not None:
+                self._units[metric] = intern_label(unit)
+            if metric in self._text:
+                self._text[metric].pop(ordinal, None)
+
+        i = bisect_left(self._days, ordinal)
+        if i == len(self._days) or self._days[i] != ordinal:
+            self._days.insert(i, ordinal)
+        self.version += 1
+        return number is not None
+
+    def latest(self, metric: str) -> Optional[float]:
+        """Most recent numeric value of a metric, or None"""
+        series = self._series.get(metric)
+        return series.values[-1] if series else None
+
+    def unit(self, metric: str) -> Optional[str]:
+        """Unit of a metric's numeric values ("lbs", "hours", "%"), or None for bare numbers"""
+        return self._units.get(metric)
+
+    @property
+    def tracking_days(self) -> int:
+        return len(self._days)
+
+    def metrics(self) -> List[str]:
+        return sorted(set(self._series) | set(self._text))
+
+    def recent_dates(self, count: int = 7) -> List[str]:
+        """Most recent tracked dates, oldest first"""
+        return [_to_iso(d) for d in self._days[-count:]]
+
+    def range(self, metric: str, start: Any, end: Any) -> Dict[str, Any]:
+        """Values of one metric between two dates (inclusive)"""
+        series = self._series.get(metric)
+        if series is None:
+            return {}
+        lo, hi = series.bounds(_to_ordinal(start), _to_ordinal(end))
+        return {_to_iso(d): _display(v) for d, v in zip(series.days[lo:hi], series.values[lo:hi])}
+
+    def window(self, days: int = 7, end: Any = None) -> Dict[str, Dict[str, Any]]:
+        """All entries of the last `days` calendar days, in {date: {metric: value}} form"""
+        end_ordinal = _to_ordinal(end) if end is not None else date.today().toordinal()
+        start_ordinal = end_ordinal - days + 1
+        out: Dict[str, Dict[str, Any]] = {}
+        for metric, series in self._series.items():
+            unit = self._units.get(metric)
+            lo, hi = series.bounds(start_ordinal, end_ordinal)
+            for d, v in zip(series.days[lo:hi], series.values[lo:hi]):
+                out.setdefault(_to_iso(d), {})[metric] = _with_unit(v, unit)
+        for metric, entries in self._text.items():
+            for d, v in entries.items():
+                if start_ordinal <= d <= end_ordinal:
+                    out.setdefault(_to_iso(d), {})[metric] = v
+        return dict(sorted(out.items()))
+
+    def aggregate(self, metric: str, days: int = 7, end: Any = None) -> Optional[Dict[str, Any]]:
+        """Mean/min/max/count of a metric over the last `days` calendar days"""
+        series = self._series.get(metric)
+        if series is None:
+            return None
+        end_ordinal = _to_ordinal(end) if end is not None else date.today().toordinal()
+        lo, hi = series.bounds(end_ordinal - days + 1, end_ordinal)
+        if lo == hi:
+            return None
+        prefix = series.prefix_sums()
+        window = series.values[lo:hi]
+        return {
+            "mean": round((prefix[hi] - prefix[lo]) / (hi - lo), 2),
+            "min": _display(min(window)),
+            "max": _display(max(window)),
+            "count": hi - lo
+        }
+
+    def rolling_mean(self, metric: str, days: int = 7) -> Dict[str, float]:
+        """Trailing `days`-day mean at every logged date of a metric"""
+        series = self._series.get(metric)
+        if series is None:
+            return {}
+        prefix = series.prefix_sums()
+        out = {}
+        for i, d in enumerate(series.days):
+            lo = bisect_left(series.days, d - days + 1, 0, i + 1)
+            out[_to_iso(d)] = round((prefix[i + 1] - prefix[lo]) / (i + 1 - lo), 2)
+        return out
+
+    def streak(self, metric: str, end: Any = None) -> int:
+        """Consecutive logged days ending today (or yesterday, if today is not logged yet)"""
+        series = self._series.get(metric)
+        days = series.days if series is not None else array('l', sorted(self._text.get(metric, {})))
+        if not days:
+            return 0
+        end_ordinal = _to_ordinal(end) if end is not None else date.today().toordinal()
+        i = bisect_right(days, end_ordinal) - 1
+        if i < 0 or days[i] < end_ordinal - 1:
+            return 0
+        count = 1
+        while i > 0 and days[i - 1] == days[i] - 1:
+            count += 1
+            i -= 1
+        return count
+
+    def trend_slope(self, metric: str, days: int = 30, end: Any = None) -> Optional[float]:
+        """Least-squares slope (change per day) over the last `days` calendar days"""
+        series = self._series.get(metric)
+        if series is None:
+            return None
+        end_ordinal = _to_ordinal(end) if end is not None else date.today().toordinal()
+        lo, hi = series.bounds(end_ordinal - days + 1, end_ordinal)
+        n = hi - lo
+        if n < 2:
+            return None
+        xs = series.days[lo:hi]
+        ys = series.values[lo:hi]
+        mean_x = sum(xs) / n
+        mean_y = sum(ys) / n
+        var_x = sum((x - mean_x) ** 2 for x in xs)
+        if var_x == 0:
+            return None
+        cov = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+        return round(cov / var_x, 3)
+
+    def summary(self, end: Any = None) -> Dict[str, Dict[str, Any]]:
+        """Compact per-metric aggregates for the coach's context prompt"""
+        out = {}
+        for metric in self._series:
+            stats = {
+                "7d": self.aggregate(metric, 7, end),
+                "30d": self.aggregate(metric, 30, end),
+                "streak": self.streak(metric, end),
+                "trend_30d": self.trend_slope(metric, 30, end),
+                "unit": self._units.get(metric)
+            }
+            out[metric] = {k: v for k, v in stats.items() if v}
+        return {k: v for k, v in out.items() if v}
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Export in the legacy {date: {metric: value}} shape used by session files.
+
+        Values logged with a unit are exported with it ("180 lbs"), so
+        from_dict() restores the unit along with the number.
+        """
+        out: Dict[str, Dict[str, Any]] = {}
+        for metric, series in self._series.items():
+            unit = self._units.get(metric)
+            for d, v in zip(series.days, series.values):
+                out.setdefault(_to_iso(d), {})[metric] = _with_unit(v, unit)
+        for metric, entries in self._text.items():
+            for d, v in entries.items():
+                out.setdefault(_to_iso(d), {})[metric] = v
+        return dict(sorted(out.items()))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Dict[str, Any]]) -> "MetricsStore":
+        store = cls()
+        for day, metrics in data.items():
+            for metric, value in metrics.items():
+                store.record(metric, value, day)
+        return store
+
+    def __len__(self):
+        return sum(len(s) for s in self._series.values()) + sum(len(t) for t in self._text.values())
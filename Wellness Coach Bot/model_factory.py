@@ -0,0 +1,54 @@
+import threading
+from typing import Dict, Tuple
+
+DEFAULT_MODEL = "gemini-2.0-flash"
+
+
+class ModelFactory:
+    """Builds Gemini models once and shares them across coach instances.
+
+    The google.generativeai SDK is imported on first use, not at module load,
+    and models are cached per (model name, system instruction) so creating a
+    new coach session costs no SDK setup and no network round trips.
+    """
+
+    def __init__(self, api_key: str, model_name: str = DEFAULT_MODEL):
+        self.api_key = api_key
+        self.model_name = model_name
+        self._models: Dict[Tuple[str, str], object] = {}
+        self._genai = None
+        self._lock = threading.Lock()
+
+    def _sdk(self):
+        if self._genai is None:
+            import google.generativeai as genai
+            genai.configure(api_key=self.api_key)
+            self._genai = genai
+        return self._genai
+
+    def get(self, system_instruction: str = None, model_name: str = None):
+        """Return the shared model for this system instruction, creating it on first use"""
+        key = (model_name or self.model_name, system_instruction or "")
+        model = self._models.get(key)
+        if model is None:
+            with self._lock:
+                model = self._models.get(key)
+                if model is None:
+                    model = self._sdk().GenerativeModel(key[0], system_instruction=system_instruction)
+                    self._models[key] = model
+        return model
+
+
+_FACTORIES: Dict[Tuple[str, str], ModelFactory] = {}
+_FACTORIES_LOCK = threading.Lock()
+
+
+def get_model_factory(api_key: str, model_name: str = DEFAULT_MODEL) -> ModelFactory:
+    """Process-wide factory per API key, reused by every coach instance"""
+    key = (api_key, model_name)
+    with _FACTORIES_LOCK:
+        factory = _FACTORIES.get(key)
+        if factory is None:
+            factory = ModelFactory(api_key, model_name)
+            _FACTORIES[key] = factory
+        return factory
@@ -0,0 +1,140 @@
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+from intent_router import IntentRouter, tokenize, get_default_router
+from rate_limiter import PREFETCH
+from search_cache import SearchCacheBackend, normalize_query
+
+# Turned into searches for each interest; each is routed like a user message, so the
+# prefetched cache key matches what a later question about the topic will look up
+DEFAULT_TEMPLATES = ["{topic}", "benefits of {topic}", "best way to {topic}", "latest research on {topic}"]
+
+# Profile fields that say what the user is likely to ask about
+INTEREST_FIELDS = ("primary_goal", "dietary_preferences")
+
+
+class SearchPrefetcher:
+    """Background, low-priority searches that fill the search cache before the user asks.
+
+    Jobs run on a small dedicated pool at PREFETCH priority, so they never hold
+    up interactive turns for provider budget. Each session may spend at most
+    `budget` network searches per `window` seconds, and its job is cancelled as
+    soon as the user starts a turn.
+    """
+
+    def __init__(self, workers: int = 2, budget: int = 8, window: float = 3600.0,
+                 max_topics: int = 6, router: IntentRouter = None):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self.budget = budget
+        self.window = window
+        self.max_topics = max_topics
+        self.router = router or get_default_router()
+        self.templates = self.router.config.get("prefetch_templates", DEFAULT_TEMPLATES)
+        self._jobs: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._spent: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.counters = {"scheduled": 0, "fetched": 0, "already_cached": 0, "cancelled": 0,
+                         "over_budget": 0, "failed": 0, "warmed": 0}
+
+    def queries_for(self, coach) -> List[str]:
+        """Likely search topics for a session, from its profile and active goals"""
+        interests = [str(coach.user_profile.get(field, "")) for field in INTEREST_FIELDS]
+        interests += [g.goal for g in coach.goals.by_status("active")]
+
+        topics = []
+        for interest in interests:
+            topic = " ".join(t for t in tokenize(interest) if t not in self.router.stopwords)
+            if topic and topic not in topics:
+                topics.append(topic)
+
+        # Template-major order: when the budget runs out every topic has at least its plain search
+        queries, seen = [], set()
+        for template in self.templates:
+            for topic in topics[:self.max_topics]:
+                text = template.format(topic=topic)
+                query = self.router.route(text).search_topic or text
+                key = normalize_query(query)
+                if key not in seen:
+                    seen.add(key)
+                    queries.append(query)
+        return queries
+
+    def schedule(self, coach) -> bool:
+        """Replace any pending job for this session with a fresh one"""
+        if coach.search_client is None:
+            return False
+        queries = self.queries_for(coach)
+        if not queries:
+            return False
+        with self._lock:
+            self._cancel_locked(coach)
+            cancelled = threading.Event()
+            future = self.executor.submit(self._run, coach, queries, cancelled)
+            self._jobs[coach] = (cancelled, future)
+            self.counters["scheduled"] += 1
+        return True
+
+    def cancel(self, coach):
+        """Stop this session's job; a search already on the wire finishes but nothing new starts"""
+        with self._lock:
+            self._cancel_locked(coach)
+
+    def _cancel_locked(self, coach):
+        job = self._jobs.pop(coach, None)
+        if job is not None and not job[1].done():
+            job[0].set()
+            job[1].cancel()
+            self.counters["cancelled"] += 1
+
+    def _remaining_budget(self, coach) -> int:
+        now = time.monotonic()
+        with self._lock:
+            spent = self._spent.setdefault(coach, deque())
+            while spent and now - spent[0] > self.window:
+                spent.popleft()
+            return self.budget - len(spent)
+
+    def _run(self, coach, queries: List[str], cancelled: threading.Event):
+        for query in queries:
+            if cancelled.is_set():
+                return
+            if self._remaining_budget(coach) <= 0:
+                self.counters["over_budget"] += 1
+                return
+            results, source = coach._search(query, priority=PREFETCH)
+            if source == "network":
+                with self._lock:
+                    self._spent.setdefault(coach, deque()).append(time.monotonic())
+                self.counters["fetched"] += 1
+            elif source == "error":
+                self.counters["failed"] += 1
+            else:
+                self.counters["already_cached"] += 1
+
+    def warm(self, coach, cache: SearchCacheBackend, top_n: int = 50) -> int:
+        """Blocking: refresh the top_n most looked-up queries that are missing from the cache"""
+        futures = []
+        for query, num_results in cache.popular_queries(top_n):
+            futures.append(self.executor.submit(coach._search, query, num_results, PREFETCH))
+        warmed = sum(1 for f in futures if f.result()[1] == "network")
+        self.counters["warmed"] += warmed
+        return warmed
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "pending": sum(1 for _, f in list(self._jobs.values()) if not f.done())}
+
+
+_SHARED_PREFETCHER: Optional[SearchPrefetcher] = None
+_SHARED_PREFETCHER_LOCK = threading.Lock()
+
+
+def get_shared_prefetcher() -> SearchPrefetcher:
+    global _SHARED_PREFETCHER
+    with _SHARED_PREFETCHER_LOCK:
+        if _SHARED_PREFETCHER is None:
+            _SHARED_PREFETCHER = SearchPrefetcher()
+        return _SHARED_PREFETCHER
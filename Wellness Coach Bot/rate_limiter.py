@@ -0,0 +1,178 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, Any, Optional
+
+# Call priorities: lower numbers are served first
+INTERACTIVE = 0
+BATCH = 1
+PREFETCH = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch", PREFETCH: "prefetch"}
+
+# Share of each budget that lower priorities must leave untouched, so an
+# interactive burst always finds headroom even while batch work saturates a provider
+DEFAULT_RESERVE = {INTERACTIVE: 0.0, BATCH: 0.1, PREFETCH: 0.3}
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a call could not get budget within its timeout"""
+
+
+class TokenBucket:
+    """Refills continuously at `per_minute / 60` units per second up to one minute of budget"""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, floor: float) -> float:
+        """Seconds until `amount` can be taken while leaving `floor` in the bucket"""
+        missing = amount + floor - self.level
+        return missing / self.rate if missing > 0 else 0.0
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute budget for one provider, shared by every session.
+
+    acquire() blocks the calling (worker) thread until both buckets have room.
+    Waiting callers are served strictly by priority: a batch or prefetch call
+    never proceeds while an interactive call is waiting, and must also leave
+    its reserve share of each bucket unused. A budget of 0 means unlimited.
+    """
+
+    def __init__(self, name: str, rpm: float = 0, tpm: float = 0, reserve: Dict[int, float] = None):
+        self.name = name
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.reserve = reserve or DEFAULT_RESERVE
+        self._cond = threading.Condition()
+        self._waiting = {p: 0 for p in PRIORITY_NAMES}
+        self.counters = {"acquired": {name: 0 for name in PRIORITY_NAMES.values()}, "waited_seconds": 0.0, "timeouts": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.requests is not None or self.tokens is not None
+
+    def _wait_time(self, tokens: int, priority: int) -> float:
+        now = time.monotonic()
+        share = self.reserve.get(priority, 0.0)
+        wait = 0.0
+        for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+            if bucket is None:
+                continue
+            bucket.refill(now)
+            # A single call larger than the whole budget waits for a full bucket instead of forever
+            amount = min(amount, bucket.capacity)
+            floor = min(share * bucket.capacity, bucket.capacity - amount)
+            wait = max(wait, bucket.wait_time(amount, floor))
+        return wait
+
+    def acquire(self, tokens: int = 0, priority: int = INTERACTIVE, timeout: Optional[float] = None) -> float:
+        """Block until one request (and `tokens` tokens) fit the budget; returns the seconds waited"""
+        if not self.enabled:
+            self.counters["acquired"][PRIORITY_NAMES[priority]] += 1
+            return 0.0
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    ahead = any(self._waiting[p] for p in PRIORITY_NAMES if p < priority)
+                    wait = self._wait_time(tokens, priority)
+                    if not ahead and wait == 0.0:
+                        if self.requests is not None:
+                            self.requests.level -= 1
+                        if self.tokens is not None:
+                            self.tokens.level -= min(tokens, self.tokens.capacity)
+                        break
+                    if deadline is not None and time.monotonic() + wait > deadline:
+                        self.counters["timeouts"] += 1
+                        raise RateLimitTimeout(f"{self.name} rate limit: no budget within {timeout}s")
+                    # Re-check at least every second so priorities are re-evaluated as waiters come and go
+                    self._cond.wait(min(wait, 1.0) if wait else 1.0)
+            finally:
+                self._waiting[priority] -= 1
+                self._cond.notify_all()
+            waited = time.monotonic() - start
+            self.counters["acquired"][PRIORITY_NAMES[priority]] += 1
+            self.counters["waited_seconds"] += waited
+            return waited
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "requests_available": round(self.requests.level, 1) if self.requests else None,
+                "tokens_available": round(self.tokens.level) if self.tokens else None,
+                "waiting": {PRIORITY_NAMES[p]: n for p, n in self._waiting.items()},
+                **self.counters,
+                "waited_seconds": round(self.counters["waited_seconds"], 3)
+            }
+
+
+class _Flight:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one; every caller gets its result"""
+
+    def __init__(self):
+        self._flights: Dict[Any, _Flight] = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def do(self, key: Any, func: Callable[[], Any]) -> tuple[Any, bool]:
+        """Run func() unless an identical call is in flight; returns (result, shared)"""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+            else:
+                self.shared += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = func()
+            return flight.result, False
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.event.set()
+
+
+_LIMITERS: Dict[str, RateLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> RateLimiter:
+    """Process-wide limiter per provider, budgeted by WELLNESS_<PROVIDER>_RPM / _TPM (unset = unlimited)"""
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(provider)
+        if limiter is None:
+            prefix = f"WELLNESS_{provider.upper()}"
+            limiter = RateLimiter(provider, rpm=float(os.getenv(f"{prefix}_RPM", "0")),
+                                  tpm=float(os.getenv(f"{prefix}_TPM", "0")))
+            _LIMITERS[provider] = limiter
+        return limiter
@@ -0,0 +1,249 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+import weakref
+from collections import Counter
+from datetime import datetime
+from itertools import count
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from intent_router import tokenize
+from session_records import DATE_FORMAT
+
+# BM25 parameters (the usual defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+_SCHEMA = ("""CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    owner INTEGER NOT NULL DEFAULT 0,
+    timestamp REAL NOT NULL,
+    user TEXT NOT NULL,
+    exchange TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    UNIQUE (owner, timestamp, user)
+)""", """CREATE TABLE IF NOT EXISTS postings (
+    owner INTEGER NOT NULL DEFAULT 0,
+    term TEXT NOT NULL,
+    doc INTEGER NOT NULL,
+    tf INTEGER NOT NULL,
+    PRIMARY KEY (owner, term, doc)
+) WITHOUT ROWID""", """CREATE TABLE IF NOT EXISTS owners (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+)""")
+
+# In-memory indexes of every session share one SQLite database, each under its own owner id;
+# a private ":memory:" connection per session costs tens of KB before anything is indexed
+_SHARED_CONN: Optional[sqlite3.Connection] = None
+_SHARED_LOCK = threading.Lock()
+_OWNERS = count(1)
+
+# Autosaved indexes in the same file share one connection, each under the owner id of its name;
+# a WAL connection per session would hold several file descriptors for every resident user
+_FILE_CONNS: Dict[str, Tuple[sqlite3.Connection, threading.Lock]] = {}
+_FILE_CONNS_LOCK = threading.Lock()
+
+
+def _shared_connection() -> sqlite3.Connection:
+    global _SHARED_CONN
+    with _SHARED_LOCK:
+        if _SHARED_CONN is None:
+            _SHARED_CONN = sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None)
+            for statement in _SCHEMA:
+                _SHARED_CONN.execute(statement)
+        return _SHARED_CONN
+
+
+def _file_connection(path: str) -> Tuple[sqlite3.Connection, threading.Lock]:
+    key = os.path.abspath(path)
+    with _FILE_CONNS_LOCK:
+        shared = _FILE_CONNS.get(key)
+        if shared is None:
+            os.makedirs(os.path.dirname(key), exist_ok=True)
+            conn = sqlite3.connect(key, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            shared = (conn, threading.Lock())
+            _FILE_CONNS[key] = shared
+        return shared
+
+
+def _release(conn: sqlite3.Connection, lock: threading.Lock, owner: int, drop_rows: bool, close: bool):
+    """Drop an index: its rows from the in-memory database, or its own connection"""
+    with lock:
+        if drop_rows:
+            conn.execute("DELETE FROM postings WHERE owner = ?", (owner,))
+            conn.execute("DELETE FROM docs WHERE owner = ?", (owner,))
+        if close:
+            conn.close()
+
+
+class RecallIndex:
+    """BM25 inverted index over a user's past exchanges, stored in SQLite.
+
+    Every exchange is added as it happens, so exchanges that have left the
+    20-exchange memory window stay searchable; search() returns the ones most
+    relevant to the current message. Postings are clustered by owner and term
+    (WITHOUT ROWID), so a query only reads the rows for its own terms. Pass
+    path=None for an in-memory index; those live in one process-wide database
+    and are removed from it on close() or when the index is garbage collected.
+    With a path and an owner name, the index is one user's rows in a file
+    shared with every other owner of that path; close() leaves them there.
+    """
+
+    def __init__(self, path: Optional[str] = None, stopwords: Iterable[str] = (), owner: Optional[str] = None):
+        self.path = path
+        self.stopwords = frozenset(stopwords)
+        if path and owner:
+            self._conn, self._lock = _file_connection(path)
+            with self._lock:
+                self._conn.execute("INSERT OR IGNORE INTO owners (name) VALUES (?)", (owner,))
+                self._owner = self._conn.execute("SELECT id FROM owners WHERE name = ?", (owner,)).fetchone()[0]
+        elif path:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            self._lock = threading.Lock()
+            self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._owner = 0
+            self._migrate()
+        else:
+            self._lock = _SHARED_LOCK
+            self._conn = _shared_connection()
+            self._owner = next(_OWNERS)
+        self._finalizer = weakref.finalize(self, _release, self._conn, self._lock, self._owner,
+                                           not path, bool(path) and not owner)
+        with self._lock:
+            self._docs, self._total_length = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs WHERE owner = ?", (self._owner,)
+            ).fetchone()
+
+    def _migrate(self):
+        """Create the tables, re-indexing files written before the owner column existed"""
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(docs)")]
+        legacy = bool(columns) and "owner" not in columns
+        payloads = [row[0] for row in self._conn.execute("SELECT exchange FROM docs ORDER BY id")] if legacy else []
+        if legacy:
+            self._conn.execute("DROP TABLE docs")
+            self._conn.execute("DROP TABLE IF EXISTS postings")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        self._docs, self._total_length = 0, 0
+        for payload in payloads:
+            self.add(json.loads(payload))
+
+    def absorb(self, path: str) -> int:
+        """Index the exchanges of a separate index file (e.g. an older per-session one), then delete it"""
+        conn = sqlite3.connect(path, timeout=30)
+        try:
+            payloads = [row[0] for row in conn.execute("SELECT exchange FROM docs ORDER BY id")]
+        finally:
+            conn.close()
+        added = sum(1 for payload in payloads if self.add(json.loads(payload)))
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        return added
+
+    def _terms(self, text: str) -> List[str]:
+        return [t for t in tokenize(text) if t not in self.stopwords]
+
+    def add(self, exchange: Dict[str, Any]) -> bool:
+        """Index one exchange; re-adding the same exchange (e.g. on journal replay) is a no-op"""
+        terms = Counter(self._terms(f"{exchange.get('user', '')} {exchange.get('agent', '')}"))
+        length = sum(terms.values())
+        payload = json.dumps(exchange, separators=(",", ":"))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO docs (owner, timestamp, user, exchange, length) VALUES (?, ?, ?, ?, ?)",
+                    (self._owner, exchange.get("timestamp", 0.0), exchange.get("user", ""), payload, length)
+                )
+                if cursor.rowcount == 0:
+                    self._conn.execute("COMMIT")
+                    return False
+                doc = cursor.lastrowid
+                self._conn.executemany("INSERT INTO postings (owner, term, doc, tf) VALUES (?, ?, ?, ?)",
+                                       [(self._owner, term, doc, tf) for term, tf in terms.items()])
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._docs += 1
+            self._total_length += length
+            return True
+
+    def search(self, query: str, k: int = 3) -> List[Dict[str, Any]]:
+        """Top-k exchanges by BM25 score, best first"""
+        terms = sorted(set(self._terms(query)))
+        if not terms or not self._docs:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT p.term, p.doc, p.tf, d.length FROM postings p JOIN docs d ON d.id = p.doc "
+                f"WHERE p.owner = ? AND p.term IN ({','.join('?' * len(terms))})", [self._owner, *terms]
+            ).fetchall()
+            n_docs, avg_length = self._docs, self._total_length / self._docs
+
+        df = Counter(term for term, _, _, _ in rows)
+        scores: Dict[int, float] = {}
+        for term, doc, tf, length in rows:
+            idf = math.log(1 + (n_docs - df[term] + 0.5) / (df[term] + 0.5))
+            norm = tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length))
+            scores[doc] = scores.get(doc, 0.0) + idf * norm
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        if not best:
+            return []
+
+        with self._lock:
+            payloads = dict(self._conn.execute(
+                f"SELECT id, exchange FROM docs WHERE id IN ({','.join('?' * len(best))})", [doc for doc, _ in best]
+            ).fetchall())
+        return [{**json.loads(payloads[doc]), "score": round(score, 3)} for doc, score in best]
+
+    def recall(self, query: str, k: int = 3, max_bytes: int = 1200, excerpt_chars: int = 300,
+               exclude: Iterable[tuple] = ()) -> List[Dict[str, str]]:
+        """Compact top-k exchanges that fit in max_bytes of JSON, skipping (timestamp, user) pairs in exclude"""
+        exclude = set(exclude)
+        recalled, used = [], 2  # the enclosing []
+        for exchange in self.search(query, k):
+            if (exchange.get("timestamp"), exchange.get("user")) in exclude:
+                continue
+            date = exchange.get("date") or datetime.fromtimestamp(exchange.get("timestamp", 0.0)).strftime(DATE_FORMAT)
+            item = {"date": date, "user": exchange.get("user", ""),
+                    "agent": exchange.get("agent", "")[:excerpt_chars]}
+            size = len(json.dumps(item).encode("utf-8")) + 2
+            if used + size > max_bytes:
+                break
+            recalled.append(item)
+            used += size
+        return recalled
+
+    def __len__(self):
+        return self._docs
+
+    def size_bytes(self) -> int:
+        """Approximate bytes this index holds: stored exchanges plus postings rows"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT (SELECT COALESCE(SUM(LENGTH(exchange) + 24), 0) FROM docs WHERE owner = ?)"
+                " + (SELECT COALESCE(SUM(LENGTH(term) + 16), 0) FROM postings WHERE owner = ?)",
+                (self._owner, self._owner)
+            ).fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM postings WHERE owner = ?", (self._owner,))
+            self._conn.execute("DELETE FROM docs WHERE owner = ?", (self._owner,))
+            self._docs, self._total_length = 0, 0
+
+    def close(self):
+        self._finalizer()
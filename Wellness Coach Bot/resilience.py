@@ -0,0 +1,213 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Any, Iterable, Iterator, Optional, Tuple
+
+# Hedged and deadline-bound calls run here, so the worker thread that waits on them never runs them itself
+_CALL_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv("WELLNESS_HEDGE_WORKERS", "32")),
+                                    thread_name_prefix="hedge")
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a dependency did not answer within its latency deadline"""
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a dependency whose circuit breaker is open"""
+
+
+class LatencyTracker:
+    """Recent successful call latencies of one dependency, for picking hedge delays"""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float, default: float, min_samples: int = 20) -> float:
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return default
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+class CircuitBreaker:
+    """Stops calling a dependency after `failure_threshold` consecutive failures.
+
+    While open, allow() returns False so callers skip the dependency (and use
+    a fallback) instead of waiting on it. After `reset_timeout` seconds one
+    trial call is let through: success closes the breaker, failure re-opens it.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+        self.counters = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            # Open, or half-open with a trial call that never reported back: try again after the timeout
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._opened_at = time.monotonic()
+                return True
+            self.counters["rejected"] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.counters["successes"] += 1
+            self._failures = 0
+            self.state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self.counters["failures"] += 1
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.counters["opened"] += 1
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def call(self, func: Callable[..., Any], *args) -> Any:
+        """Run func(*args) through the breaker; raises CircuitOpen without calling it while open"""
+        if not self.allow():
+            raise CircuitOpen(f"{self.name} circuit is open")
+        try:
+            result = func(*args)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self._failures, **self.counters}
+
+
+def hedged_call(func: Callable[[], Any], hedge_after: Optional[float] = None,
+                deadline: Optional[float] = None) -> Tuple[Any, bool]:
+    """Run func() within `deadline` seconds, starting one duplicate if it is still running after `hedge_after`.
+
+    Returns (result, hedge_won). The first successful call wins; a call that
+    is left behind keeps running in the background and its result is dropped.
+    Raises DeadlineExceeded when nothing succeeded in time, or the last error
+    when every call failed.
+    """
+    start = time.monotonic()
+    pending = {_CALL_EXECUTOR.submit(func)}
+    hedge = None
+    error: Optional[BaseException] = None
+    while pending:
+        now = time.monotonic()
+        timeouts = []
+        if hedge is None and hedge_after is not None:
+            timeouts.append(max(0.0, start + hedge_after - now))
+        if deadline is not None:
+            timeouts.append(max(0.0, start + deadline - now))
+        done, pending = wait(pending, timeout=min(timeouts) if timeouts else None, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                return future.result(), future is hedge
+            except Exception as e:
+                error = e
+        now = time.monotonic()
+        if deadline is not None and now - start >= deadline:
+            raise DeadlineExceeded(f"no answer within {deadline:g}s")
+        if pending and hedge is None and hedge_after is not None and now - start >= hedge_after:
+            hedge = _CALL_EXECUTOR.submit(func)
+            pending.add(hedge)
+    raise error
+
+
+def call_with_deadline(func: Callable[[], Any], deadline: Optional[float]) -> Any:
+    return hedged_call(func, None, deadline)[0]
+
+
+def iter_with_deadline(start: Callable[[], Iterable], deadline: Optional[float]) -> Iterator:
+    """Yield the items of start() (e.g. a streamed reply) as they arrive, all within `deadline` seconds.
+
+    start() and the iteration run on a thread of their own, so a stream that
+    stalls before its first item or part-way through raises DeadlineExceeded
+    here. That thread stops pulling items once the consumer is gone. Streams
+    hold their thread for the whole reply, so they stay off _CALL_EXECUTOR
+    and never keep hedged searches waiting for a worker.
+    """
+    began = time.monotonic()
+    items: queue.Queue = queue.Queue()
+    stopped = threading.Event()
+
+    def pump():
+        try:
+            for item in start():
+                if stopped.is_set():
+                    return
+                items.put(("item", item))
+            items.put(("end", None))
+        except BaseException as e:
+            items.put(("error", e))
+
+    threading.Thread(target=pump, name="stream-pump", daemon=True).start()
+    try:
+        while True:
+            timeout = None if deadline is None else max(0.0, began + deadline - time.monotonic())
+            try:
+                kind, value = items.get(timeout=timeout)
+            except queue.Empty:
+                raise DeadlineExceeded(f"stream not finished within {deadline:g}s") from None
+            if kind == "end":
+                return
+            if kind == "error":
+                raise value
+            yield value
+    finally:
+        stopped.set()
+
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_TRACKERS: Dict[str, LatencyTracker] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_breaker(dependency: str) -> CircuitBreaker:
+    """Process-wide breaker per dependency, tuned by WELLNESS_BREAKER_FAILURES / WELLNESS_BREAKER_RESET"""
+    with _REGISTRY_LOCK:
+        breaker = _BREAKERS.get(dependency)
+        if breaker is None:
+            breaker = CircuitBreaker(dependency, failure_threshold=int(os.getenv("WELLNESS_BREAKER_FAILURES", "5")),
+                                     reset_timeout=float(os.getenv("WELLNESS_BREAKER_RESET", "30")))
+            _BREAKERS[dependency] = breaker
+        return breaker
+
+
+def get_latency_tracker(dependency: str) -> LatencyTracker:
+    with _REGISTRY_LOCK:
+        tracker = _TRACKERS.get(dependency)
+        if tracker is None:
+            tracker = LatencyTracker()
+            _TRACKERS[dependency] = tracker
+        return tracker
+
+
+def breaker_stats() -> Dict[str, Any]:
+    with _REGISTRY_LOCK:
+        breakers = dict(_BREAKERS)
+    return {name: breaker.stats() for name, breaker in breakers.items()}
@@ -0,0 +1,382 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+DEFAULT_TTL_SECONDS = 3600
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+# Lookup counts (for cache warming) are kept this long after a query was last asked
+POPULARITY_TTL_SECONDS = 30 * 24 * 3600
+# Lookup counts are buffered in memory and written out once this many queries are pending, or this often
+POPULARITY_FLUSH_ENTRIES = 256
+POPULARITY_FLUSH_SECONDS = 30.0
+# A hit only rewrites an entry's last-access time (for LRU eviction) when it is older than this
+ACCESS_TOUCH_SECONDS = 60.0
+# Expired entries are kept this long past their TTL, to answer with while the provider is down
+DEFAULT_STALE_SECONDS = 7 * 24 * 3600
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def normalize_query(query: str, num_results: int = 5) -> str:
+    """Build a cache key that ignores casing, whitespace, punctuation and word order.
+
+    Words are Unicode-aware ("schlafqualität", "睡眠"), and repeated words are
+    kept, so queries that differ only in a repetition stay distinct.
+    """
+    tokens = sorted(_TOKEN_RE.findall(query.casefold()))
+    return f"{' '.join(tokens)}|{num_results}"
+
+
+def split_key(key: str) -> Tuple[str, int]:
+    """(normalized words, num_results) of a cache key"""
+    query, _, num_results = key.rpartition("|")
+    return query, int(num_results)
+
+
+class SearchCacheBackend(ABC):
+    """Interface for search result caches shared by coach sessions"""
+
+    def __init__(self, ttl: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_BYTES, stale_ttl: float = DEFAULT_STALE_SECONDS):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.evictions = 0
+        self._stats_lock = threading.Lock()
+        self._pending_lookups: Dict[str, list] = {}  # key -> [lookups, last, raw query]
+        self._last_flush = time.monotonic()
+
+    def get(self, query: str, num_results: int = 5, track: bool = True) -> Optional[Dict[str, Any]]:
+        """Return cached results for a query, or None on miss/expiry.
+
+        track=False leaves the query's popularity alone, for lookups the
+        prefetcher makes on its own rather than on a user's behalf.
+        """
+        key = normalize_query(query, num_results)
+        if track:
+            self._count_lookup(key, query)
+        value = self._get(key)
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def get_stale(self, query: str, num_results: int = 5) -> Optional[Tuple[Dict[str, Any], float]]:
+        """(results, seconds past expiry) for an expired entry still within stale_ttl, or None"""
+        found = self._get_stale(normalize_query(query, num_results))
+        if found is None:
+            return None
+        payload, created = found
+        age = time.time() - created - self.ttl
+        if age < 0 or age >= self.stale_ttl:
+            return None
+        return json.loads(payload), age
+
+    def count_stale_hit(self):
+        """Record that a result from get_stale() was actually served"""
+        with self._stats_lock:
+            self.stale_hits += 1
+
+    def set(self, query: str, results: Dict[str, Any], num_results: int = 5):
+        """Store results for a query, evicting old entries past the size caps"""
+        self._set(normalize_query(query, num_results), results)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss statistics plus current size"""
+        lookups = self.hits + self.misses
+        entries, size = self._size()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "stale_hits": self.stale_hits,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size
+        }
+
+    def popular_queries(self, limit: int = 50) -> List[Tuple[str, int]]:
+        """(query, num_results) pairs looked up most often, whether or not they are cached now.
+
+        The query is the last raw wording a user asked with, so searching for it
+        again hits the same key and the provider sees a real question.
+        """
+        self.flush_popularity()
+        popular = []
+        for key, query in self._popular(limit):
+            words, num_results = split_key(key)
+            popular.append((query or words, num_results))
+        return popular
+
+    def _count_lookup(self, key: str, query: str):
+        with self._stats_lock:
+            pending = self._pending_lookups.get(key)
+            if pending is None:
+                self._pending_lookups[key] = [1, time.time(), query]
+            else:
+                pending[0] += 1
+                pending[1] = time.time()
+                pending[2] = query
+            due = (len(self._pending_lookups) >= POPULARITY_FLUSH_ENTRIES
+                   or time.monotonic() - self._last_flush >= POPULARITY_FLUSH_SECONDS)
+        if due:
+            self.flush_popularity()
+
+    def flush_popularity(self):
+        """Write buffered lookup counts to the backend"""
+        with self._stats_lock:
+            pending, self._pending_lookups = self._pending_lookups, {}
+            self._last_flush = time.monotonic()
+        if pending:
+            self._add_lookups(pending)
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+    @abstractmethod
+    def _add_lookups(self, pending: Dict[str, list]):
+        """Merge {key: [lookups, last, raw query]} into the popularity counts"""
+
+    @abstractmethod
+    def _popular(self, limit: int) -> List[Tuple[str, Optional[str]]]:
+        """(key, raw query) pairs with the most lookups"""
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def _get_stale(self, key: str) -> Optional[Tuple[str, float]]:
+        """(payload, created) of an entry, fresh or not"""
+
+    @abstractmethod
+    def _set(self, key: str, results: Dict[str, Any]):
+        ...
+
+    @abstractmethod
+    def _size(self) -> tuple[int, int]:
+        ...
+
+
+class MemorySearchCache(SearchCacheBackend):
+    """In-process LRU + TTL cache, useful for tests and single-worker setups"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._entries = OrderedDict()  # key -> (created, size, payload)
+        self._bytes = 0
+        self._lookups = Counter()
+        self._queries: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _add_lookups(self, pending: Dict[str, list]):
+        with self._lock:
+            for key, (lookups, _, query) in pending.items():
+                self._lookups[key] += lookups
+                self._queries[key] = query
+            if len(self._lookups) > self.max_entries * 4:
+                self._lookups = Counter(dict(self._lookups.most_common(self.max_entries)))
+                self._queries = {key: self._queries[key] for key in self._lookups if key in self._queries}
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created, size, payload = entry
+            age = time.time() - created
+            if age >= self.ttl:
+                if age >= self.ttl + self.stale_ttl:
+                    del self._entries[key]
+                    self._bytes -= size
+                return None
+            self._entries.move_to_end(key)
+            return json.loads(payload)
+
+    def _get_stale(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            return (entry[2], entry[0]) if entry is not None else None
+
+    def _set(self, key: str, results: Dict[str, Any]):
+        payload = json.dumps(results, separators=(",", ":"))
+        size = len(payload.encode("utf-8"))
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (time.time(), size, payload)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def _size(self) -> tuple[int, int]:
+        with self._lock:
+            return len(self._entries), self._bytes
+
+    def _popular(self, limit: int) -> List[Tuple[str, Optional[str]]]:
+        with self._lock:
+            return [(key, self._queries.get(key)) for key, _ in self._lookups.most_common(limit)]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+class SQLiteSearchCache(SearchCacheBackend):
+    """File-backed LRU + TTL cache that survives restarts and is shared between processes"""
+
+    def __init__(self, path: str = "wellness_search_cache.db", **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS search_cache (
+            key TEXT PRIMARY KEY,
+            payload TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created REAL NOT NULL,
+            accessed REAL NOT NULL
+        )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_search_cache_accessed ON search_cache(accessed)")
+        # Outlives cache entries, so queries that expired can still be warmed at startup
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS search_popularity (
+            key TEXT PRIMARY KEY,
+            lookups INTEGER NOT NULL,
+            last REAL NOT NULL,
+            query TEXT
+        )""")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(search_popularity)")]
+        if "query" not in columns:
+            self._conn.execute("ALTER TABLE search_popularity ADD COLUMN query TEXT")
+
+    def _add_lookups(self, pending: Dict[str, list]):
+        rows = [(key, lookups, last, query) for key, (lookups, last, query) in pending.items()]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO search_popularity (key, lookups, last, query) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET lookups = lookups + excluded.lookups, "
+                    "last = MAX(last, excluded.last), query = excluded.query", rows
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, created, accessed FROM search_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            payload, created, accessed = row
+            if now - created >= self.ttl:
+                if now - created >= self.ttl + self.stale_ttl:
+                    self._conn.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+                return None
+            if now - accessed >= ACCESS_TOUCH_SECONDS:
+                self._conn.execute("UPDATE search_cache SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(payload)
+
+    def _get_stale(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            return self._conn.execute("SELECT payload, created FROM search_cache WHERE key = ?", (key,)).fetchone()
+
+    def _set(self, key: str, results: Dict[str, Any]):
+        payload = json.dumps(results, separators=(",", ":"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO search_cache (key, payload, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                    (key, payload, len(payload.encode("utf-8")), now, now)
+                )
+                self._evict(now)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self, now: float):
+        """Drop entries past their stale window, then least recently used ones until under both caps"""
+        expired = self._conn.execute("DELETE FROM search_cache WHERE created <= ?",
+                                     (now - self.ttl - self.stale_ttl,)).rowcount
+        self.evictions += max(expired, 0)
+        self._conn.execute("DELETE FROM search_popularity WHERE last <= ?", (now - POPULARITY_TTL_SECONDS,))
+
+        entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM search_cache").fetchone()
+        if entries <= self.max_entries and size <= self.max_bytes:
+            return
+
+        rows = self._conn.execute("SELECT key, size FROM search_cache ORDER BY accessed ASC").fetchall()
+        doomed = []
+        for key, entry_size in rows:
+            if entries <= self.max_entries and size <= self.max_bytes:
+                break
+            doomed.append((key,))
+            entries -= 1
+            size -= entry_size
+        self._conn.executemany("DELETE FROM search_cache WHERE key = ?", doomed)
+        self.evictions += len(doomed)
+
+    def _size(self) -> tuple[int, int]:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM search_cache").fetchone()
+
+    def _popular(self, limit: int) -> List[Tuple[str, Optional[str]]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, query FROM search_popularity ORDER BY lookups DESC, last DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [(key, query) for key, query in rows]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM search_cache")
+
+    def close(self):
+        self.flush_popularity()
+        with self._lock:
+            self._conn.close()
+
+
+_SHARED_CACHES: Dict[str, SQLiteSearchCache] = {}
+_SHARED_CACHES_LOCK = threading.Lock()
+
+
+def get_shared_cache(path: str = "wellness_search_cache.db") -> SQLiteSearchCache:
+    """One SQLite cache (and connection) per file, shared by every session in the process"""
+    key = os.path.abspath(path)
+    with _SHARED_CACHES_LOCK:
+        cache = _SHARED_CACHES.get(key)
+        if cache is None:
+            cache = SQLiteSearchCache(path)
+            _SHARED_CACHES[key] = cache
+        return cache
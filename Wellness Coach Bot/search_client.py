@@ -0,0 +1,181 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, List, Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limiter import RateLimiter, INTERACTIVE, BATCH, get_rate_limiter
+from resilience import hedged_call
+
+SERPER_URL = "https://google.serper.dev/search"
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class SerperError(Exception):
+    """Raised when a Serper search fails after all retries"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.status_code is None or self.status_code in RETRYABLE_STATUS
+
+
+class SerperClient:
+    """Pooled, retrying HTTP client for the Serper search API.
+
+    One client is meant to be shared by every coach session in a process: the
+    underlying requests.Session keeps TCP/TLS connections alive between searches.
+    """
+
+    def __init__(self, api_key: str, url: str = SERPER_URL, pool_size: int = 20,
+                 connect_timeout: float = 3.05, read_timeout: float = 10.0,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 rate_limiter: RateLimiter = None):
+        self.api_key = api_key
+        self.url = url
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # Every attempt (retries included) spends from the provider-wide budget
+        self.rate_limiter = rate_limiter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            'X-API-KEY': api_key,
+            'Content-Type': 'application/json'
+        })
+
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def search(self, query: str, num_results: int = 5, gl: str = 'us', hl: str = 'en',
+               priority: int = INTERACTIVE, hedge_after: Optional[float] = None,
+               deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Run one search, retrying transient failures. Returns the raw Serper JSON.
+
+        With hedge_after, an attempt still unanswered after that many seconds
+        gets one duplicate request. Only single attempts are hedged; nothing is
+        sent while backing off (e.g. on a 429's Retry-After). `deadline` bounds
+        the whole search, retries included, and raises DeadlineExceeded.
+        """
+        payload = {
+            'q': query,
+            'num': num_results,
+            'gl': gl,  # Geolocation
+            'hl': hl   # Language
+        }
+
+        start = time.monotonic()
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                if hedge_after is None and deadline is None:
+                    return self._attempt(payload, priority)
+                remaining = None if deadline is None else max(0.0, start + deadline - time.monotonic())
+                return hedged_call(lambda: self._attempt(payload, priority), hedge_after, remaining)[0]
+            except SerperError as e:
+                if not e.retryable:
+                    raise
+                last_error = e
+
+            if attempt < self.max_retries:
+                delay = self._backoff_delay(attempt, last_error.retry_after)
+                if deadline is not None and time.monotonic() + delay - start >= deadline:
+                    break
+                time.sleep(delay)
+
+        raise last_error
+
+    def _attempt(self, payload: Dict[str, Any], priority: int) -> Dict[str, Any]:
+        """One request; every failure is a SerperError, retryable or not"""
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(priority=priority)
+        try:
+            response = self.session.post(self.url, json=payload, timeout=self.timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise SerperError(f"Serper request failed: {e}")
+        if response.status_code >= 400:
+            retry_after = None
+            if response.status_code in RETRYABLE_STATUS:
+                retry_after = self._parse_retry_after(response.headers.get("Retry-After"))
+            raise SerperError(f"Serper returned HTTP {response.status_code}", response.status_code, retry_after)
+        return response.json()
+
+    def search_many(self, queries: List[str], num_results: int = 5,
+                    priority: int = BATCH) -> List[Union[Dict[str, Any], SerperError]]:
+        """Run many searches concurrently over the pooled connections.
+
+        Results come back in input order; a failed query yields its SerperError
+        instead of raising so one bad query does not sink the batch.
+        """
+        futures = [self._get_executor().submit(self.search, query, num_results, priority=priority)
+                   for query in queries]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except SerperError as e:
+                results.append(e)
+        return results
+
+    def close(self):
+        """Close pooled connections and worker threads"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self.session.close()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="serper")
+            return self._executor
+
+    def _backoff_delay(self, attempt: int, retry_after: Optional[float]) -> float:
+        """Full-jitter exponential backoff, overridden by the server's Retry-After"""
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    @staticmethod
+    def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """Retry-After may be delta-seconds or an HTTP date"""
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            when = parsedate_to_datetime(value)
+            return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
+
+_SHARED_CLIENTS: Dict[tuple, SerperClient] = {}
+_SHARED_CLIENTS_LOCK = threading.Lock()
+
+
+def get_shared_client(api_key: str, url: str = SERPER_URL) -> SerperClient:
+    """One pooled client per API key, shared by every session in the process"""
+    key = (api_key, url)
+    with _SHARED_CLIENTS_LOCK:
+        client = _SHARED_CLIENTS.get(key)
+        if client is None:
+            client = SerperClient(api_key, url, rate_limiter=get_rate_limiter("serper"))
+            _SHARED_CLIENTS[key] = client
+        return client
@@ -0,0 +1,40 @@
+from datetime import date
+from typing import Dict, Any, List
+
+from trust_registry import TrustRegistry, canonicalize_url
+
+# Top-tier domains named in the authoritative sub-query (each one costs query words)
+AUTHORITATIVE_SITES = 4
+
+
+def expand_query(query: str, registry: TrustRegistry, year: int = None) -> Dict[str, str]:
+    """Focused sub-queries for one question: the original, top-tier sources only, and recent research"""
+    variants = {"original": query}
+    sites = registry.top_domains(AUTHORITATIVE_SITES)
+    if sites:
+        variants["authoritative"] = f"{query} ({' OR '.join(f'site:{domain}' for domain in sites)})"
+    variants["recent"] = f"{query} latest research {year or date.today().year}"
+    return variants
+
+
+def merge_results(result_lists: List[List[Dict[str, Any]]], limit: int = None) -> List[Dict[str, Any]]:
+    """Union of several ranked result lists, deduplicated by canonical URL.
+
+    Each page gets a `frequency`: how many lists returned it. Pages are ranked
+    by trust_score × frequency; ties keep the best position any list gave the
+    page (earlier lists first), so the original query's order survives within
+    a tier.
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    rank: Dict[str, tuple] = {}
+    for leg, results in enumerate(result_lists):
+        for position, result in enumerate(results):
+            key = canonicalize_url(result.get("url", ""))
+            if key in merged:
+                merged[key]["frequency"] += 1
+                rank[key] = min(rank[key], (position, leg))
+                continue
+            merged[key] = {**result, "frequency": 1}
+            rank[key] = (position, leg)
+    ordered = sorted(merged, key=lambda key: (-merged[key].get("trust_score", 1) * merged[key]["frequency"], rank[key]))
+    return [merged[key] for key in ordered[:limit]]
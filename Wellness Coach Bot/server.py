@@ -0,0 +1,379 @@
+import argparse
+import asyncio
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional
+
+from aiohttp import web, WSMsgType
+
+from app import PersonalWellnessCoach, _BLOCKING_EXECUTOR
+from instrumentation import get_default_instrumentation
+from rate_limiter import INTERACTIVE, get_rate_limiter
+from prefetch import get_shared_prefetcher
+from validation_batcher import validation_batcher_stats
+from resilience import breaker_stats
+from model_factory import get_model_factory
+from search_cache import get_shared_cache
+from search_client import get_shared_client
+
+
+class SessionEntry:
+    """A resident coach session plus its per-tenant concurrency guard.
+
+    `active` counts requests holding or waiting for the session; it is never
+    evicted while that is non-zero. `evicting` is set while its state is being
+    written out, and requests for the user wait for it before starting afresh.
+    """
+
+    __slots__ = ("user_id", "coach", "semaphore", "last_used", "ready", "active", "evicting")
+
+    def __init__(self, user_id: str, per_tenant_concurrency: int):
+        self.user_id = user_id
+        self.coach: Optional[PersonalWellnessCoach] = None
+        self.semaphore = asyncio.Semaphore(per_tenant_concurrency)
+        self.last_used = time.monotonic()
+        self.ready = asyncio.Lock()
+        self.active = 0
+        self.evicting: Optional[asyncio.Event] = None
+
+
+class SessionManager:
+    """Hosts many coach sessions in one process, keyed by user ID.
+
+    Sessions are created lazily on a user's first message, evicted to the
+    session store when idle (or when too many are resident) and restored on
+    demand. Every session shares one model factory, search client and search cache.
+    """
+
+    def __init__(self, api_key: str, serper_api_key: str = None, store_dir: str = "sessions",
+                 max_resident: int = 5000, idle_seconds: float = 900, per_tenant_concurrency: int = 1,
+                 max_inflight: int = 256, admission_timeout: float = 2.0, priority: int = INTERACTIVE,
+                 prefetch_idle_seconds: float = 30.0):
+        self.api_key = api_key
+        self.serper_api_key = serper_api_key or os.getenv("SERPER_API_KEY")
+        self.store_dir = store_dir
+        self.max_resident = max_resident
+        self.idle_seconds = idle_seconds
+        self.per_tenant_concurrency = per_tenant_concurrency
+        self.admission_timeout = admission_timeout
+        # Rate-limit priority of every call made by these sessions
+        self.priority = priority
+        self.prefetch_idle_seconds = prefetch_idle_seconds
+        os.makedirs(store_dir, exist_ok=True)
+
+        # Shared across every tenant
+        self.model_factory = get_model_factory(api_key)
+        self.search_client = get_shared_client(self.serper_api_key) if self.serper_api_key else None
+        self.search_cache = (get_shared_cache(os.getenv("WELLNESS_SEARCH_CACHE", "wellness_search_cache.db"))
+                             if self.search_client is not None else None)
+        self.admission = asyncio.Semaphore(max_inflight)
+        self.instrumentation = get_default_instrumentation()
+
+        self.sessions: "OrderedDict[str, SessionEntry]" = OrderedDict()
+        self.stats = {"created": 0, "restored": 0, "evicted": 0, "rejected": 0, "turns": 0}
+
+    def _session_path(self, user_id: str) -> str:
+        safe = re.sub(r"[^A-Za-z0-9_.-]", "_", user_id)[:64]
+        digest = hashlib.sha1(user_id.encode("utf-8")).hexdigest()[:10]
+        return os.path.join(self.store_dir, f"{safe}_{digest}")
+
+    def _create_coach(self, user_id: str) -> PersonalWellnessCoach:
+        """Blocking: build a coach and restore its journaled state, if any"""
+        coach = PersonalWellnessCoach(self.api_key, self.serper_api_key, search_cache=self.search_cache,
+                                      search_client=self.search_client, model_factory=self.model_factory,
+                                      instrumentation=self.instrumentation)
+        coach.priority = self.priority
+        result = coach.enable_autosave(self._session_path(user_id))
+        if result.startswith("Error"):
+            print(result)
+        self.stats["restored" if "resumed" in result else "created"] += 1
+        return coach
+
+    async def _claim(self, user_id: str) -> SessionEntry:
+        """The session entry for user_id, marked active; waits out an eviction that is still writing it"""
+        while True:
+            entry = self.sessions.get(user_id)
+            if entry is None:
+                entry = SessionEntry(user_id, self.per_tenant_concurrency)
+                self.sessions[user_id] = entry
+            if entry.evicting is None:
+                break
+            await entry.evicting.wait()
+        entry.active += 1
+        self.sessions.move_to_end(user_id)
+        entry.last_used = time.monotonic()
+        return entry
+
+    async def _load(self, entry: SessionEntry):
+        """Create or restore the entry's coach if it is not resident yet"""
+        user_id = entry.user_id
+        if entry.coach is None:
+            async with entry.ready:
+                if entry.coach is None:
+                    loop = asyncio.get_running_loop()
+                    entry.coach = await loop.run_in_executor(_BLOCKING_EXECUTOR, self._create_coach, user_id)
+
+        if len(self.sessions) > self.max_resident:
+            asyncio.create_task(self.evict_over_capacity())
+
+    @asynccontextmanager
+    async def _turn(self, user_id: str):
+        """Hold user_id's session for one request: its tenant slot first, then a server-wide admission slot.
+
+        Requests queued behind the same tenant wait on its own semaphore
+        rather than holding admission slots other tenants could use.
+        """
+        entry = await self._claim(user_id)
+        try:
+            async with entry.semaphore:
+                await self._admit()
+                try:
+                    await self._load(entry)
+                    yield entry
+                    entry.last_used = time.monotonic()
+                finally:
+                    self.admission.release()
+        finally:
+            entry.active -= 1
+
+    async def _admit(self):
+        """Server-wide admission control: wait briefly for a slot, then shed load"""
+        try:
+            await asyncio.wait_for(self.admission.acquire(), timeout=self.admission_timeout)
+        except asyncio.TimeoutError:
+            self.stats["rejected"] += 1
+            raise web.HTTPServiceUnavailable(text="Server busy, please retry shortly")
+
+    async def chat(self, user_id: str, message: str) -> Dict[str, Any]:
+        async with self._turn(user_id) as entry:
+            reply = await entry.coach.achat(message)
+            self.stats["turns"] += 1
+            result = {"reply": reply, "timing": entry.coach.last_turn_timing}
+            if entry.coach.last_turn_error:
+                result["error"] = entry.coach.last_turn_error  # the reply is only the fallback apology
+            return result
+
+    async def chat_stream(self, user_id: str, message: str):
+        """Async generator bridging the coach's blocking chat_stream onto the event loop.
+
+        If the consumer stops early (e.g. the client disconnected), the pump
+        thread is told to stop and awaited before the session's slots are released.
+        """
+        async with self._turn(user_id) as entry:
+            loop = asyncio.get_running_loop()
+            queue: asyncio.Queue = asyncio.Queue()
+            done = object()
+            stop = threading.Event()
+
+            def pump():
+                stream = entry.coach.chat_stream(message)
+                try:
+                    for chunk in stream:
+                        if stop.is_set():
+                            break
+                        loop.call_soon_threadsafe(queue.put_nowait, chunk)
+                finally:
+                    stream.close()
+                    loop.call_soon_threadsafe(queue.put_nowait, done)
+
+            producer = loop.run_in_executor(_BLOCKING_EXECUTOR, pump)
+            try:
+                while True:
+                    chunk = await queue.get()
+                    if chunk is done:
+                        break
+                    yield chunk
+            finally:
+                stop.set()
+                await producer
+            self.stats["turns"] += 1
+
+    async def _evict(self, user_id: str):
+        entry = self.sessions.get(user_id)
+        if entry is None or entry.active or entry.evicting is not None:
+            return
+        # The entry stays mapped until its state is written, so a returning user waits for that
+        # instead of restoring the journal while it is still being closed
+        entry.evicting = asyncio.Event()
+        try:
+            if entry.coach is not None:
+                if entry.coach.prefetcher is not None:
+                    entry.coach.prefetcher.cancel(entry.coach)
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(_BLOCKING_EXECUTOR, entry.coach.close_autosave)
+        finally:
+            if self.sessions.get(user_id) is entry:
+                del self.sessions[user_id]
+            entry.evicting.set()
+        self.stats["evicted"] += 1
+
+    async def evict_idle(self):
+        cutoff = time.monotonic() - self.idle_seconds
+        idle = [uid for uid, entry in self.sessions.items() if entry.last_used < cutoff]
+        for user_id in idle:
+            await self._evict(user_id)
+
+    async def evict_over_capacity(self):
+        # OrderedDict is in least-recently-used order
+        while len(self.sessions) > self.max_resident:
+            before = len(self.sessions)
+            for user_id in list(self.sessions)[:len(self.sessions) - self.max_resident]:
+                await self._evict(user_id)
+            if len(self.sessions) == before:
+                break  # everything left is busy
+
+    def prefetch_idle(self):
+        """Start background searches for sessions that are idle and whose interests changed"""
+        cutoff = time.monotonic() - self.prefetch_idle_seconds
+        for entry in list(self.sessions.values()):
+            coach = entry.coach
+            if coach is not None and coach.prefetch_pending and entry.last_used < cutoff \
+                    and not entry.active and entry.evicting is None:
+                coach._interests_changed()
+
+    async def warm_cache(self, top_n: int) -> int:
+        """Refresh the top_n most popular queries missing from the search cache"""
+        if self.search_client is None or top_n <= 0:
+            return 0
+        coach = PersonalWellnessCoach(self.api_key, self.serper_api_key, search_cache=self.search_cache,
+                                      search_client=self.search_client, model_factory=self.model_factory,
+                                      instrumentation=self.instrumentation)
+        loop = asyncio.get_running_loop()
+        warmed = await loop.run_in_executor(_BLOCKING_EXECUTOR, get_shared_prefetcher().warm, coach, self.search_cache, top_n)
+        print(f" Search cache warmed: {warmed} of the top {top_n} queries fetched")
+        return warmed
+
+    async def evict_loop(self, interval: float = 30.0):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.evict_idle()
+                self.prefetch_idle()
+            except Exception as e:
+                print(f"Eviction error: {e}")
+
+    async def close(self):
+        for user_id in list(self.sessions):
+            await self._evict(user_id)
+        if self.search_cache is not None:
+            self.search_cache.flush_popularity()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "resident": len(self.sessions),
+            "search_cache": self.search_cache.stats() if self.search_cache is not None else None,
+            "latency": self.instrumentation.summary(),
+            "rate_limits": {provider: get_rate_limiter(provider).stats() for provider in ("gemini", "serper")},
+            "prefetch": get_shared_prefetcher().stats(),
+            "validation": validation_batcher_stats(),
+            "circuit_breakers": breaker_stats()
+        }
+
+
+async def handle_chat(request: web.Request) -> web.Response:
+    """POST /chat {"user_id": ..., "message": ...}"""
+    manager: SessionManager = request.app["sessions"]
+    try:
+        body = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(text="Expected a JSON body")
+    user_id = str(body.get("user_id", "")).strip()
+    message = str(body.get("message", ""))
+    if not user_id:
+        raise web.HTTPBadRequest(text="user_id is required")
+    return web.json_response(await manager.chat(user_id, message))
+
+
+async def handle_ws(request: web.Request) -> web.WebSocketResponse:
+    """GET /ws?user_id=... - each text frame is a message; replies stream back as chunk frames"""
+    manager: SessionManager = request.app["sessions"]
+    user_id = request.query.get("user_id", "").strip()
+    if not user_id:
+        raise web.HTTPBadRequest(text="user_id is required")
+
+    ws = web.WebSocketResponse(heartbeat=30)
+    await ws.prepare(request)
+    async for msg in ws:
+        if msg.type != WSMsgType.TEXT:
+            continue
+        stream = manager.chat_stream(user_id, msg.data)
+        try:
+            async for chunk in stream:
+                await ws.send_json({"type": "chunk", "text": chunk})
+            entry = manager.sessions.get(user_id)
+            timing = entry.coach.last_turn_timing if entry and entry.coach else {}
+            await ws.send_json({"type": "done", "timing": timing})
+        except web.HTTPServiceUnavailable as e:
+            await ws.send_json({"type": "error", "error": e.text})
+        finally:
+            # Close it now rather than when it is garbage collected, so a dropped client frees its slots
+            await stream.aclose()
+    return ws
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    return web.json_response(request.app["sessions"].snapshot())
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    """Per-stage latency histograms and counters in Prometheus text format"""
+    manager: SessionManager = request.app["sessions"]
+    return web.Response(text=manager.instrumentation.to_prometheus(), content_type="text/plain")
+
+
+def create_app(manager: SessionManager, warm_top: int = 0) -> web.Application:
+    app = web.Application()
+    app["sessions"] = manager
+    app.router.add_post("/chat", handle_chat)
+    app.router.add_get("/ws", handle_ws)
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+
+    async def start_background(app):
+        app["evict_task"] = asyncio.create_task(manager.evict_loop())
+        # Warm in the background so the server starts accepting requests immediately
+        app["warm_task"] = asyncio.create_task(manager.warm_cache(warm_top))
+
+    async def stop_background(app):
+        app["evict_task"].cancel()
+        app["warm_task"].cancel()
+        await manager.close()
+
+    app.on_startup.append(start_background)
+    app.on_cleanup.append(stop_background)
+    return app
+
+
+def main(argv=None):
+    """Entry point for `python app.py serve`"""
+    parser = argparse.ArgumentParser(prog="app.py serve", description="Run Dr. Wellness as a multi-user server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--store-dir", default="sessions")
+    parser.add_argument("--max-resident", type=int, default=5000)
+    parser.add_argument("--idle-seconds", type=float, default=900)
+    parser.add_argument("--max-inflight", type=int, default=256)
+    parser.add_argument("--per-tenant", type=int, default=1)
+    parser.add_argument("--warm-top", type=int, default=0,
+                        help="at startup, refresh the N most popular search queries missing from the cache")
+    args = parser.parse_args(argv)
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        print(" Please set your GEMINI_API_KEY environment variable")
+        return
+
+    async def build():
+        manager = SessionManager(api_key, store_dir=args.store_dir, max_resident=args.max_resident,
+                                 idle_seconds=args.idle_seconds, per_tenant_concurrency=args.per_tenant,
+                                 max_inflight=args.max_inflight)
+        return create_app(manager, warm_top=args.warm_top)
+
+    print(f" Dr. Wellness server listening on {args.host}:{args.port}")
+    web.run_app(build(), host=args.host, port=args.port, print=None)
@@ -0,0 +1,59 @@
+import sys
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class Exchange:
+    """One user/coach exchange; the display date is derived from the epoch timestamp"""
+
+    __slots__ = ("user", "agent", "timestamp")
+
+    def __init__(self, user: str, agent: str, timestamp: float):
+        self.user = user
+        self.agent = agent
+        self.timestamp = timestamp
+
+    @property
+    def date(self) -> str:
+        return datetime.fromtimestamp(self.timestamp).strftime(DATE_FORMAT)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"user": self.user, "agent": self.agent, "timestamp": self.timestamp}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Exchange":
+        """Accepts older records that also carry a "date" string (or only that)"""
+        timestamp = data.get("timestamp")
+        if timestamp is None:
+            try:
+                timestamp = datetime.strptime(data.get("date", ""), DATE_FORMAT).timestamp()
+            except ValueError:
+                timestamp = 0.0
+        return cls(data.get("user", ""), data.get("agent", ""), float(timestamp))
+
+
+def intern_label(value: Any) -> str:
+    """Labels repeated across records (categories, statuses, metric names) share one string object"""
+    return sys.intern(str(value))
+
+
+def deep_sizeof(obj: Any, seen: set = None) -> int:
+    """Approximate bytes held by an object and everything it references (shared objects counted once)"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__slots__"):
+        size += sum(deep_sizeof(getattr(obj, name), seen) for name in obj.__slots__ if hasattr(obj, name))
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    return size
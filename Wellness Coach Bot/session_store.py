@@ -0,0 +1,116 @@
+import json
+import os
+import tempfile
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+
+def atomic_write_json(path: str, data: Dict[str, Any], fsync: bool = True):
+    """Write JSON to a temp file in the same directory, then rename over path.
+
+    A crash mid-write leaves the previous file intact instead of a truncated one.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class SessionJournal:
+    """Append-only journal with periodic atomic snapshots for one session.
+
+    Every change (exchange, metric, goal, profile update) is appended as one
+    compact JSON line carrying a sequence number. Every `snapshot_every`
+    entries the full state is written atomically and the journal truncated;
+    the snapshot records the last sequence it covers, so a crash between the
+    two steps never applies an entry twice. Loading reads the snapshot and
+    replays only the journal tail.
+    """
+
+    def __init__(self, base_path: str, snapshot_every: int = 200, fsync: bool = False):
+        self.snapshot_path = f"{base_path}.snapshot.json"
+        self.journal_path = f"{base_path}.journal.jsonl"
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        os.makedirs(os.path.dirname(os.path.abspath(base_path)), exist_ok=True)
+        self.seq = 0
+        self.entries_since_snapshot = 0
+        self._fh = None
+        self._lock = threading.Lock()
+
+    def exists(self) -> bool:
+        return os.path.exists(self.snapshot_path) or os.path.exists(self.journal_path)
+
+    def load(self) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Return the latest snapshot state (or None) and the journal entries after it"""
+        state, snapshot_seq = None, 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r") as f:
+                snapshot = json.load(f)
+            state = snapshot.get("state")
+            snapshot_seq = snapshot.get("seq", 0)
+
+        tail = []
+        if os.path.exists(self.journal_path):
+            good_end, last_line = 0, b"\n"
+            with open(self.journal_path, "rb") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # torn final line from a crash mid-append
+                    good_end += len(line)
+                    last_line = line
+                    if entry.get("seq", 0) > snapshot_seq:
+                        tail.append(entry)
+            # Cut a torn line off before appending, or new entries would be glued onto it and lost on every load
+            if good_end < os.path.getsize(self.journal_path):
+                os.truncate(self.journal_path, good_end)
+            if not last_line.endswith(b"\n"):
+                with open(self.journal_path, "ab") as f:
+                    f.write(b"\n")
+
+        self.seq = tail[-1]["seq"] if tail else snapshot_seq
+        self.entries_since_snapshot = len(tail)
+        return state, tail
+
+    def append(self, op: str, data: Dict[str, Any]):
+        """Append one change; costs O(size of the change)"""
+        with self._lock:
+            self.seq += 1
+            line = json.dumps({"seq": self.seq, "op": op, **data}, separators=(",", ":"))
+            if self._fh is None:
+                self._fh = open(self.journal_path, "a")
+            self._fh.write(line + "\n")
+            self._fh.flush()
+            if self.fsync:
+                os.fsync(self._fh.fileno())
+            self.entries_since_snapshot += 1
+
+    def needs_snapshot(self) -> bool:
+        return self.entries_since_snapshot >= self.snapshot_every
+
+    def snapshot(self, state: Dict[str, Any]):
+        """Atomically persist the full state, then start a fresh journal"""
+        with self._lock:
+            atomic_write_json(self.snapshot_path, {"seq": self.seq, "state": state})
+            if self._fh is not None:
+                self._fh.close()
+            self._fh = open(self.journal_path, "w")
+            self.entries_since_snapshot = 0
+
+    def close(self):
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+DEFAULT_REGISTRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "trusted_sources.json")
+
+# Query parameters that never change the page content
+TRACKING_PARAMS = {"gclid", "fbclid", "msclkid", "ref", "ref_src", "mc_cid", "mc_eid", "_ga"}
+
+
+def _host(url: str) -> str:
+    try:
+        host = (urlsplit(url).hostname or "").lower().rstrip(".")
+    except ValueError:
+        return ""
+    for prefix in ("www.", "m."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    return host
+
+
+def canonicalize_url(url: str) -> str:
+    """Scheme-less canonical form used to deduplicate results.
+
+    Lowercases the host, strips www./m. prefixes, default ports, fragments,
+    tracking parameters and trailing slashes, and sorts the remaining query.
+    """
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port  # raises ValueError for a malformed or out-of-range port
+    except ValueError:
+        return url.strip().lower()
+    host = _host(url)
+    if port and port not in (80, 443):
+        host = f"{host}:{port}"
+    path = parts.path.rstrip("/") or ""
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    )
+    canonical = host + path
+    if query:
+        canonical += "?" + urlencode(query)
+    return canonical
+
+
+def _weight(value: Any, where: str) -> int:
+    """A trust weight as a non-negative int (it is shown as that many stars); ValueError otherwise"""
+    number = -1.0
+    if not isinstance(value, bool):
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            pass
+    if not number.is_integer() or number < 0:
+        raise ValueError(f"{where}: trust weight must be a whole number >= 0, got {value!r}")
+    return int(number)
+
+
+class TrustRegistry:
+    """Weighted source-trust tiers indexed by reversed domain labels.
+
+    "pubmed.ncbi.nlm.nih.gov" is stored under gov -> nih -> nlm -> ncbi -> pubmed,
+    so looking up a host walks at most one trie node per label and the most
+    specific matching suffix wins. Matching is exact per label: "nih.gov"
+    matches "www.nih.gov" but never "notnih.gov" or a page title.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.default_weight = _weight(config.get("default_weight", 1), "default_weight")
+        self._root: Dict[str, Any] = {}
+        self._domains: List[Tuple[int, str]] = []  # (weight, domain) in registration order
+        for tier, spec in config.get("tiers", {}).items():
+            weight = _weight(spec.get("weight"), f"tier {tier!r}")
+            for domain in spec.get("domains", []):
+                self.add(domain, weight, tier)
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_REGISTRY_PATH) -> "TrustRegistry":
+        with open(path, "r") as f:
+            return cls(json.load(f))
+
+    def add(self, domain: str, weight: int, tier: str):
+        weight = _weight(weight, f"domain {domain!r}")
+        node = self._root
+        for label in reversed(domain.lower().strip(".").split(".")):
+            node = node.setdefault(label, {})
+        node[None] = (weight, tier)  # None key marks the end of a registered suffix
+        self._domains.append((weight, domain.lower().strip(".")))
+
+    def top_domains(self, limit: int = 4) -> List[str]:
+        """Registered domains of the highest-weight tier (bare suffixes like "gov" left out)"""
+        domains = [(weight, domain) for weight, domain in self._domains if "." in domain]
+        if not domains:
+            return []
+        best = max(weight for weight, _ in domains)
+        return [domain for weight, domain in domains if weight == best][:limit]
+
+    def lookup(self, host: str) -> Tuple[int, Optional[str]]:
+        """(weight, tier) of the most specific registered suffix of host"""
+        best = (self.default_weight, None)
+        node = self._root
+        for label in reversed(host.split(".")):
+            node = node.get(label)
+            if node is None:
+                break
+            best = node.get(None, best)
+        return best
+
+    def score(self, url: str) -> Tuple[int, Optional[str]]:
+        return self.lookup(_host(url))
+
+    def process(self, raw_results: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Score and deduplicate the organic, knowledge-graph and "people also ask" sections"""
+        candidates = []
+        for result in raw_results.get("organic", []):
+            candidates.append((result.get("link", ""), result.get("title", ""), result.get("snippet", "")))
+
+        graph = raw_results.get("knowledgeGraph") or {}
+        graph_link = graph.get("descriptionLink") or graph.get("website")
+        if graph_link:
+            candidates.append((graph_link, graph.get("title", ""), graph.get("description", "")))
+
+        for item in raw_results.get("peopleAlsoAsk", []):
+            if item.get("link"):
+                candidates.append((item["link"], item.get("title") or item.get("question", ""), item.get("snippet", "")))
+
+        seen = set()
+        processed = []
+        for link, title, snippet in candidates:
+            if not link:
+                continue
+            canonical = canonicalize_url(link)
+            if canonical in seen:
+                continue
+            seen.add(canonical)
+            host = _host(link)
+            weight, _ = self.lookup(host)
+            processed.append({
+                "title": title,
+                "url": link,
+                "snippet": snippet,
+                "trust_score": weight,
+                "source": host or "Unknown"
+            })
+
+        # Stable sort keeps the provider's ranking within a trust tier
+        processed.sort(key=lambda x: x["trust_score"], reverse=True)
+        return processed
+
+
+_DEFAULT_REGISTRY: Optional[TrustRegistry] = None
+_DEFAULT_REGISTRY_LOCK = threading.Lock()
+
+
+def get_default_registry() -> TrustRegistry:
+    """Process-wide registry loaded from WELLNESS_TRUST_REGISTRY (or the bundled trusted_sources.json)"""
+    global _DEFAULT_REGISTRY
+    with _DEFAULT_REGISTRY_LOCK:
+        if _DEFAULT_REGISTRY is None:
+            _DEFAULT_REGISTRY = TrustRegistry.from_file(os.getenv("WELLNESS_TRUST_REGISTRY", DEFAULT_REGISTRY_PATH))
+        return _DEFAULT_REGISTRY
@@ -0,0 +1,141 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Optional, Tuple
+
+from intent_router import Intent, IntentRouter, get_default_router
+
+Verdict = Tuple[bool, str]
+
+DEFAULT_REDIRECT = "I'm here to help with your health and wellness journey! What would you like to know about nutrition, fitness, mental health, or healthy habits?"
+
+
+def parse_verdict(text: str) -> Verdict:
+    """Turn a "VALID" / "INVALID: <redirect>" reply into a verdict; anything else counts as valid"""
+    result = text.strip()
+    if result.startswith("INVALID"):
+        return False, result.replace("INVALID:", "").strip() or DEFAULT_REDIRECT
+    return True, ""
+
+
+def normalize_input(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(re.findall(r"[a-z0-9']+", text.lower()))
+
+
+class LocalValidator:
+    """Rule/keyword classifier that decides the clear-cut cases without a network call.
+
+    The keyword lists (built from the VALID/INVALID categories of the validator
+    prompt) live in intents.json; the IntentRouter matches them in the same pass
+    that decides commands and search, and this class turns its hint into a verdict.
+    Only inputs made entirely of wellness terms, greetings and filler are passed
+    locally, and only entirely off-topic ones are refused; anything mixed or
+    unrecognised goes to the LLM.
+    """
+
+    def __init__(self, router: IntentRouter = None):
+        self.router = router or get_default_router()
+
+    def classify(self, intent: Intent) -> Optional[Verdict]:
+        """Return a verdict, or None when the input needs the LLM validator"""
+        hint = intent.validator_hint
+        if hint is None or hint == "ambiguous":
+            return None
+        if hint.startswith("invalid:"):
+            return False, self.router.invalid_redirect(hint[len("invalid:"):]) or DEFAULT_REDIRECT
+        if hint == "off_topic":
+            return False, DEFAULT_REDIRECT
+        return True, ""  # "valid" or "greeting"
+
+
+class VerdictCache:
+    """Bounded LRU of validator verdicts keyed by normalized input"""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Verdict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Verdict]:
+        with self._lock:
+            verdict = self._entries.get(key)
+            if verdict is not None:
+                self._entries.move_to_end(key)
+            return verdict
+
+    def set(self, key: str, verdict: Verdict):
+        with self._lock:
+            self._entries[key] = verdict
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Verdicts are not user-specific, so every session in the process shares one cache
+_SHARED_VERDICT_CACHE = VerdictCache()
+_SHARED_LOCAL_VALIDATOR: Optional[LocalValidator] = None
+_SHARED_LOCAL_VALIDATOR_LOCK = threading.Lock()
+
+
+def _get_local_validator() -> LocalValidator:
+    """Process-wide LocalValidator, built once even when sessions start concurrently"""
+    global _SHARED_LOCAL_VALIDATOR
+    with _SHARED_LOCAL_VALIDATOR_LOCK:
+        if _SHARED_LOCAL_VALIDATOR is None:
+            _SHARED_LOCAL_VALIDATOR = LocalValidator()
+        return _SHARED_LOCAL_VALIDATOR
+
+
+class TieredValidator:
+    """Local rules first, then the verdict cache, and the LLM only for ambiguous input"""
+
+    # Very short follow-ups ("why?", "yes please") depend on conversation context,
+    # so their LLM verdicts are not cached.
+    MIN_CACHEABLE_WORDS = 3
+
+    def __init__(self, llm_validate: Callable[[str], Verdict], cache: VerdictCache = None,
+                 local: LocalValidator = None):
+        self.llm_validate = llm_validate
+        self.cache = cache if cache is not None else _SHARED_VERDICT_CACHE
+        self.local = local or _get_local_validator()
+        self.counters = {"local": 0, "cache": 0, "llm": 0}
+        # Tier that answered the most recent validate() call
+        self.last_tier: Optional[str] = None
+
+    def validate(self, user_input: str, intent: Intent = None) -> Verdict:
+        """Validate input; pass the already-routed intent to skip re-matching it"""
+        normalized = normalize_input(user_input)
+        if intent is None:
+            intent = self.local.router.route(user_input)
+
+        verdict = self.local.classify(intent)
+        if verdict is not None:
+            self.counters["local"] += 1
+            self.last_tier = "local"
+            return verdict
+
+        verdict = self.cache.get(normalized)
+        if verdict is not None:
+            self.counters["cache"] += 1
+            self.last_tier = "cache"
+            return verdict
+
+        self.counters["llm"] += 1
+        self.last_tier = "llm"
+        verdict = self.llm_validate(user_input)
+        if len(normalized.split()) >= self.MIN_CACHEABLE_WORDS:
+            self.cache.set(normalized, verdict)
+        return verdict
+
+    def stats(self) -> Dict[str, Any]:
+        """Turn counts per tier and the share of turns each tier handled"""
+        total = sum(self.counters.values())
+        return {
+            **self.counters,
+            "total": total,
+            "share": {tier: round(count / total, 3) if total else 0.0 for tier, count in self.counters.items()}
+        }